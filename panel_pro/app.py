@@ -1,13 +1,33 @@
 import os
+import io
+import sys
+import socket
+import csv
+import time
+import hashlib
 import secrets
 import datetime as dt
 import json
 import logging
+import threading
 import requests
-from flask import Flask, redirect, url_for, request, render_template, jsonify, flash, session, abort
-from sqlalchemy import create_engine, select, Integer, String, DateTime, ForeignKey, Boolean, event, update
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship, Session, selectinload
+from collections import deque, OrderedDict
+from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, Response, redirect, url_for, request, render_template, jsonify, flash, session, abort, stream_with_context, g as flask_g, has_request_context
+from sqlalchemy import create_engine, inspect, select, text, func, Integer, String, DateTime, ForeignKey, Boolean, event, update, or_, and_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship, Session, selectinload, joinedload, contains_eager
 from dotenv import load_dotenv
+from session_store import SQLiteSessionInterface
+from images import ResponsiveImages, is_variant_filename
+
+try:
+    from shared import scores as quiz_scores
+except ImportError:
+    # Hors Docker : shared/ est à côté de panel_pro/ (et non monté dans /app/shared)
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from shared import scores as quiz_scores
 
 load_dotenv()
 
@@ -29,6 +49,40 @@ TRIAL_DAYS = int(os.getenv("TRIAL_DAYS", 5))
 DEV_MODE = os.getenv("DEV_MODE", "1") == "1"
 BASE_URL = os.getenv("BASE_URL", "http://localhost:5000")
 LOG_WEBHOOK = os.getenv("LOG_WEBHOOK", "1") == "1"
+# Sessions côté serveur : le cookie ne contient plus qu'un identifiant opaque
+SESSION_DB = os.getenv("SESSION_DB", os.path.join(os.path.dirname(__file__), "sessions.db"))
+SESSION_IDLE_TIMEOUT = int(os.getenv("SESSION_IDLE_DAYS", 7)) * 86400
+# Budget de requêtes SQL du dashboard : bot_types, guildes, abonnements, trial lock
+DASHBOARD_MAX_STATEMENTS = 4
+# En-tête X-DB-Statements (nb de requêtes SQL par réponse), à activer explicitement pour le profilage
+DB_STATEMENTS_HEADER = os.getenv("DB_STATEMENTS_HEADER", "0") == "1"
+
+# --- Admin : liste des abonnements paginée côté serveur ---
+ADMIN_PAGE_SIZE = 50
+EXPORT_BATCH_SIZE = 500
+EXPORT_FIELDS = (
+    "id", "bot_key", "guild_discord_id", "guild_name", "platform", "status",
+    "trial_until", "current_period_end", "cancel_at_period_end",
+    "stripe_subscription_id", "created_at", "updated_at",
+)
+ADMIN_STATUS_FILTERS = {
+    "active": ("active", "past_due"),
+    "trial": ("trial", "trialing"),
+    "canceled": ("canceled", "unpaid", "incomplete"),
+    "lifetime": ("lifetime",),
+}
+
+# --- Salons Discord du planificateur : cache par guilde ---
+CHANNEL_CACHE_TTL = int(os.getenv("CHANNEL_CACHE_TTL", 300))
+CHANNEL_STALE_WAIT = 1.5   # attente max d'un rafraîchissement avant de servir la liste expirée
+CHANNEL_COLD_WAIT = 10     # premier chargement : rien à servir, on attend l'appel en vol
+CHANNEL_BACKOFF_LEASE = "discord_channels_backoff"  # pause après un 429, partagée entre workers
+
+# --- Cache de rendu des pages publiques ---
+PAGE_CACHE_SIZE = 512
+PAGE_LOCALES = ["fr", "en"]
+# Version du contenu partagée entre workers (table cache_versions), relue au plus une fois par intervalle
+PAGE_VERSION_CHECK_INTERVAL = 1.0
 
 try:
     import stripe
@@ -80,6 +134,22 @@ BOT_TOKENS = {
     "yoda": YODA_TOKEN,
 }
 
+# --- Leaderboard : scores (SQLite partagé avec les bots) + cache des profils Discord ---
+SCORES_DB = os.getenv("SCORES_DB", "/app/shared/scores.db")
+LEADERBOARD_SIZE = 20
+PROFILE_TTL = dt.timedelta(hours=int(os.getenv("PROFILE_TTL_HOURS", 24)))
+PROFILE_REFRESH_INTERVAL = int(os.getenv("PROFILE_REFRESH_INTERVAL", 300))
+PROFILE_REFRESH_TOP = 100
+PROFILE_FETCH_CONCURRENCY = 4
+# Identifiant du worker gunicorn pour les baux des tâches de fond (un seul worker appelle Discord)
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# --- Avatars des bots : table partagée entre workers, rafraîchie en tâche de fond ---
+BOT_AVATAR_TTL = dt.timedelta(hours=int(os.getenv("BOT_AVATAR_TTL_HOURS", 6)))
+BOT_AVATAR_SYNC_INTERVAL = int(os.getenv("BOT_AVATAR_SYNC_INTERVAL", 60))
+# Fenêtres des agrégats écrits par shared/scores.py (libellés des onglets)
+LEADERBOARD_WINDOWS = {"all": "Depuis toujours", "week": "Cette semaine", "day": "Aujourd'hui"}
+
 
 class Base(DeclarativeBase):
     pass
@@ -111,7 +181,7 @@ class BotType(Base):
 class Subscription(Base):
     __tablename__ = "subscriptions"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    guild_id: Mapped[int] = mapped_column(ForeignKey("guilds.id"))
+    guild_id: Mapped[int] = mapped_column(ForeignKey("guilds.id"), index=True)
     bot_type_id: Mapped[int] = mapped_column(ForeignKey("bot_types.id"))
     status: Mapped[str] = mapped_column(String, default="trial")
     trial_until: Mapped[dt.datetime | None] = mapped_column(DateTime, nullable=True)
@@ -120,6 +190,10 @@ class Subscription(Base):
     current_period_end: Mapped[dt.datetime | None] = mapped_column(DateTime, nullable=True)
     cancel_at_period_end: Mapped[bool] = mapped_column(Boolean, default=False)
     created_at: Mapped[dt.datetime] = mapped_column(DateTime, default=lambda: dt.datetime.utcnow())
+    updated_at: Mapped[dt.datetime | None] = mapped_column(
+        DateTime, nullable=True, index=True,
+        default=lambda: dt.datetime.utcnow(), onupdate=lambda: dt.datetime.utcnow()
+    )
 
     guild: Mapped["Guild"] = relationship()
     bot_type: Mapped["BotType"] = relationship()
@@ -144,6 +218,38 @@ class TrialLock(Base):
     created_at: Mapped[dt.datetime] = mapped_column(DateTime, default=lambda: dt.datetime.utcnow())
 
 
+class UserProfile(Base):
+    __tablename__ = "user_profiles"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    discord_id: Mapped[str] = mapped_column(String, unique=True, index=True)
+    username: Mapped[str | None] = mapped_column(String, nullable=True)
+    avatar_url: Mapped[str | None] = mapped_column(String, nullable=True)
+    fetched_at: Mapped[dt.datetime] = mapped_column(DateTime, index=True)
+
+
+class BackgroundLease(Base):
+    __tablename__ = "background_leases"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String, unique=True)
+    holder: Mapped[str] = mapped_column(String)
+    expires_at: Mapped[dt.datetime] = mapped_column(DateTime)
+
+
+class CacheVersion(Base):
+    __tablename__ = "cache_versions"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String, unique=True)
+    version: Mapped[int] = mapped_column(Integer, default=0)
+
+
+class BotAvatar(Base):
+    __tablename__ = "bot_avatars"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    bot_key: Mapped[str] = mapped_column(String, unique=True, index=True)
+    avatar_url: Mapped[str | None] = mapped_column(String, nullable=True)
+    fetched_at: Mapped[dt.datetime] = mapped_column(DateTime)
+
+
 class ScheduledTask(Base):
     __tablename__ = "scheduled_tasks"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -192,6 +298,28 @@ def _check_api_token():
 def make_app():
     app = Flask(__name__)
     app.secret_key = SECRET_KEY
+    app.session_interface = SQLiteSessionInterface(SESSION_DB, idle_timeout=SESSION_IDLE_TIMEOUT)
+
+    # --- Images responsives (variantes AVIF/WebP hashées, cf. images.py) ---
+    app.images = ResponsiveImages(app.static_folder, app.static_url_path)
+    app.images.ensure_async()
+    app.jinja_env.globals.update(responsive_img=app.images.picture, image_url=app.images.url)
+
+    variants_prefix = f"{app.static_url_path}/img/"
+
+    @app.before_request
+    def _only_serve_image_variants():
+        # static/img/ contient aussi manifest.json, .build.lock et les .tmp d'un build en cours
+        if request.path.startswith(variants_prefix) and not is_variant_filename(request.path[len(variants_prefix):]):
+            abort(404)
+
+    @app.after_request
+    def _immutable_static_variants(response):
+        # Nom = hash du contenu : le fichier ne change jamais, cache navigateur/CDN d'un an
+        if (request.path.startswith(variants_prefix) and response.status_code == 200
+                and is_variant_filename(request.path[len(variants_prefix):])):
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
 
     # --- CSRF Protection ---
     try:
@@ -215,6 +343,11 @@ def make_app():
         for view_name in CSRF_EXEMPT_VIEWS:
             csrf.exempt(view_name)
 
+        # Le jeton n'est plus dans le HTML (pages cacheables, pas de session pour les visiteurs) :
+        # base.html le demande à /csrf-token avant le premier POST
+        from flask_wtf.csrf import generate_csrf
+        app.generate_csrf = generate_csrf
+
         logger.info("CSRF protection enabled")
     except ImportError:
         logger.warning("flask-wtf not installed, CSRF protection disabled")
@@ -230,6 +363,9 @@ def make_app():
         limiter = None
         logger.warning("flask-limiter not installed, rate limiting disabled")
 
+    if not hasattr(app, "generate_csrf"):
+        app.generate_csrf = None
+
     connect_args = {}
     if "sqlite" in DATABASE_URL:
         connect_args = {"check_same_thread": False, "timeout": 30}
@@ -245,8 +381,38 @@ def make_app():
             cursor.close()
 
     Base.metadata.create_all(app.engine)
-
-    app.config["BOT_AVATARS"] = None
+    # create_all n'ajoute ni colonnes ni index aux tables existantes
+    try:
+        sub_columns = {c["name"] for c in inspect(app.engine).get_columns("subscriptions")}
+        with app.engine.begin() as conn:
+            if "updated_at" not in sub_columns:
+                conn.execute(text("ALTER TABLE subscriptions ADD COLUMN updated_at TIMESTAMP"))
+                conn.execute(text("UPDATE subscriptions SET updated_at = created_at"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_subscriptions_guild_id ON subscriptions (guild_id)"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_subscriptions_updated_at ON subscriptions (updated_at)"))
+    except Exception as e:
+        # Plusieurs workers peuvent migrer en même temps : le premier gagne
+        logger.warning("Migration subscriptions: %s", e)
+
+    # Compteur de requêtes SQL par requête HTTP (alerte si le dashboard dépasse son budget, X-DB-Statements sur demande)
+    @event.listens_for(app.engine, "before_cursor_execute")
+    def _count_statements(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            flask_g.db_statements = flask_g.get("db_statements", 0) + 1
+
+    @app.after_request
+    def _report_statements(response):
+        count = flask_g.get("db_statements", 0)
+        if request.endpoint == "dashboard" and count > DASHBOARD_MAX_STATEMENTS:
+            logger.warning("Dashboard: %d requêtes SQL (budget %d)", count, DASHBOARD_MAX_STATEMENTS)
+        if DB_STATEMENTS_HEADER:
+            response.headers["X-DB-Statements"] = str(count)
+        return response
+
+    # Copie locale (par worker) de la table bot_avatars, remplacée d'un bloc par le thread de sync
+    app.bot_avatars = {}
+    app.bot_avatars_version = 0
+    app.bot_avatars_ready = threading.Event()
 
     # --- Health Check ---
     @app.get("/health")
@@ -353,41 +519,123 @@ def make_app():
             perms_int = 0
         return bool(is_owner) or (perms_int & (PERM_ADMIN | PERM_MANAGE_GUILD))
 
+    def _dialect_insert():
+        """insert() avec ON CONFLICT (PostgreSQL/SQLite), None pour les autres bases."""
+        dialect = app.engine.dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            return None
+        return dialect_insert
+
+    def _claim_lease(name: str, ttl: dt.timedelta) -> bool:
+        """Bail partagé entre workers : True si ce worker détient (ou renouvelle) le bail `name`."""
+        now = dt.datetime.utcnow()
+        with Session(app.engine) as db:
+            claimed = db.execute(
+                update(BackgroundLease)
+                .where(BackgroundLease.name == name, or_(BackgroundLease.expires_at < now, BackgroundLease.holder == WORKER_ID))
+                .values(holder=WORKER_ID, expires_at=now + ttl)
+            ).rowcount
+            if not claimed:
+                if db.scalar(select(BackgroundLease.id).where(BackgroundLease.name == name)) is not None:
+                    return False
+                db.add(BackgroundLease(name=name, holder=WORKER_ID, expires_at=now + ttl))
+            try:
+                db.commit()
+            except IntegrityError:
+                # L'autre worker a créé le bail au même moment
+                return False
+        return True
+
+    def _bump_cache_version(name: str):
+        """Incrémente cache_versions[name] : les autres workers voient l'invalidation à leur prochaine lecture."""
+        with Session(app.engine) as db:
+            bumped = db.execute(
+                update(CacheVersion).where(CacheVersion.name == name).values(version=CacheVersion.version + 1)
+            ).rowcount
+            if not bumped:
+                db.add(CacheVersion(name=name, version=1))
+            try:
+                db.commit()
+            except IntegrityError:
+                # Ligne créée au même moment par l'autre worker : on incrémente la sienne
+                db.rollback()
+                db.execute(update(CacheVersion).where(CacheVersion.name == name).values(version=CacheVersion.version + 1))
+                db.commit()
+
+    app.bump_cache_version = _bump_cache_version
+
+    def _upsert_guilds(db: Session, rows: list[dict]):
+        """Insère les nouvelles guildes et rafraîchit nom/icône des existantes, par lots."""
+        dialect_insert = _dialect_insert()
+        if dialect_insert:
+            for i in range(0, len(rows), 500):
+                stmt = dialect_insert(Guild).values(rows[i:i + 500])
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[Guild.discord_id],
+                    set_={"name": stmt.excluded.name, "icon_url": stmt.excluded.icon_url},
+                    # Pas d'écriture si rien n'a changé
+                    where=or_(
+                        Guild.name.is_distinct_from(stmt.excluded.name),
+                        Guild.icon_url.is_distinct_from(stmt.excluded.icon_url)
+                    )
+                )
+                db.execute(stmt)
+            return
+
+        # Autres bases : une lecture groupée puis insert/update en mémoire
+        existing = {g.discord_id: g for g in db.scalars(select(Guild).where(Guild.discord_id.in_([r["discord_id"] for r in rows])))}
+        for r in rows:
+            g = existing.get(r["discord_id"])
+            if not g:
+                db.add(Guild(**r))
+            elif (g.name, g.icon_url) != (r["name"], r["icon_url"]):
+                g.name, g.icon_url = r["name"], r["icon_url"]
+
     def sync_user_and_guilds(access_token: str):
         uh = {"Authorization": f"Bearer {access_token}"}
-        u = requests.get(f"{DISCORD_API_BASE}/users/@me", headers=uh, timeout=15)
-        g = requests.get(f"{DISCORD_API_BASE}/users/@me/guilds", headers=uh, timeout=15)
+        # Les deux appels Discord partent en parallèle
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            fu = pool.submit(requests.get, f"{DISCORD_API_BASE}/users/@me", headers=uh, timeout=15)
+            fg = pool.submit(requests.get, f"{DISCORD_API_BASE}/users/@me/guilds", headers=uh, timeout=15)
+            u, g = fu.result(), fg.result()
         u.raise_for_status()
         g.raise_for_status()
 
         u = u.json()
-        guilds = g.json() if isinstance(g.json(), list) else []
+        guilds = g.json()
+        if not isinstance(guilds, list):
+            guilds = []
 
         admin_ids = []
-        guild_icons = {}
+        rows = []
         for gg in guilds:
             is_owner = bool(gg.get("owner"))
             perms_val = gg.get("permissions") or gg.get("permissions_new") or 0
             if has_admin_perms(perms_val, is_owner):
                 gid = str(gg.get("id"))
+                icon_hash = gg.get("icon")
                 admin_ids.append(gid)
-                guild_icons[gid] = gg.get("icon")
+                rows.append({
+                    "discord_id": gid,
+                    "name": gg.get("name", ""),
+                    "platform": "discord",
+                    "icon_url": f"https://cdn.discordapp.com/icons/{gid}/{icon_hash}.png?size=128" if icon_hash else None,
+                })
 
         session["admin_guild_ids"] = admin_ids
-        session["guild_icons"] = guild_icons
 
         with Session(app.engine) as db:
             user = db.scalar(select(User).where(User.username == u.get("username")))
             if not user:
                 user = User(username=u.get("username"), is_owner=True if u.get("id") else False)
                 db.add(user)
-                db.commit()
 
-            for gid in admin_ids:
-                existing = db.scalar(select(Guild).where(Guild.discord_id == gid))
-                if not existing:
-                    name = next((x.get("name", "") for x in guilds if str(x.get("id")) == gid), "")
-                    db.add(Guild(discord_id=gid, name=name, platform="discord"))
+            if rows:
+                _upsert_guilds(db, rows)
             db.commit()
 
         return u
@@ -398,42 +646,85 @@ def make_app():
         except Exception:
             return False
 
+    def _static_bot_avatar(key: str) -> str | None:
+        static_path = os.path.join(app.static_folder or "static", "bots", f"{key}.png")
+        return f"/static/bots/{key}.png" if file_exists(static_path) else None
+
     def _get_bot_avatar_urls() -> dict:
-        if app.config.get("BOT_AVATARS"):
-            return app.config["BOT_AVATARS"]
+        # Jamais d'appel Discord pendant un rendu : copie mémoire, sinon images statiques
+        cached = app.bot_avatars
+        return {key: cached.get(key) or _static_bot_avatar(key) for key in BOT_TOKENS}
 
-        avatars = dict[str, str | None]()
+    def _fetch_bot_avatar(token: str) -> str | None:
+        try:
+            r = requests.get(
+                f"{DISCORD_API_BASE}/users/@me",
+                headers={"Authorization": f"Bot {token}"},
+                timeout=10
+            )
+            if r.status_code != 200:
+                return None
+            me = r.json()
+            uid = me.get("id")
+            av = me.get("avatar")
+            if uid and av:
+                return f"https://cdn.discordapp.com/avatars/{uid}/{av}.png?size=64"
+            elif uid:
+                idx = int(uid) % 5
+                return f"https://cdn.discordapp.com/embed/avatars/{idx}.png"
+        except Exception as e:
+            logger.warning("Erreur récupération avatar bot: %s", e)
+        return None
 
-        for key, token in BOT_TOKENS.items():
-            url = None
-            if token:
-                try:
-                    r = requests.get(
-                        f"{DISCORD_API_BASE}/users/@me",
-                        headers={"Authorization": f"Bot {token}"},
-                        timeout=10
-                    )
-                    if r.status_code == 200:
-                        me = r.json()
-                        uid = me.get("id")
-                        av = me.get("avatar")
-                        if uid and av:
-                            url = f"https://cdn.discordapp.com/avatars/{uid}/{av}.png?size=64"
-                        elif uid:
-                            idx = int(uid) % 5
-                            url = f"https://cdn.discordapp.com/embed/avatars/{idx}.png"
-                except Exception:
-                    pass
+    def sync_bot_avatars() -> int:
+        """Relit la table bot_avatars ; le détenteur du bail rafraîchit en parallèle les entrées expirées.
+        Renvoie le nb rafraîchi."""
+        with Session(app.engine) as db:
+            rows = {r.bot_key: r for r in db.scalars(select(BotAvatar))}
+            now = dt.datetime.utcnow()
+            stale = [k for k, t in BOT_TOKENS.items() if t and (k not in rows or rows[k].fetched_at < now - BOT_AVATAR_TTL)]
+
+            refreshed = 0
+            # Un seul worker appelle Discord (pas de doublon d'INSERT sur bot_key) ;
+            # les autres relisent la table au cycle suivant
+            if stale and not _claim_lease("bot-avatars", dt.timedelta(seconds=BOT_AVATAR_SYNC_INTERVAL * 2)):
+                stale = []
+            if stale:
+                with ThreadPoolExecutor(max_workers=len(stale)) as pool:
+                    urls = dict(zip(stale, pool.map(lambda k: _fetch_bot_avatar(BOT_TOKENS[k]), stale)))
+                for key, url in urls.items():
+                    row = rows.get(key)
+                    if not row:
+                        row = rows[key] = BotAvatar(bot_key=key)
+                        db.add(row)
+                    # Échec : on garde l'ancienne URL, nouvel essai au prochain TTL
+                    if url or not row.avatar_url:
+                        row.avatar_url = url
+                        refreshed += 1
+                    row.fetched_at = now
+
+            # Lu avant le commit (expire_on_commit rechargerait chaque ligne)
+            avatars = {k: r.avatar_url for k, r in rows.items()}
+            if stale:
+                db.commit()
 
-            if not url:
-                static_path = os.path.join(app.static_folder or "static", "bots", f"{key}.png")
-                if file_exists(static_path):
-                    url = f"/static/bots/{key}.png"
+        if avatars != app.bot_avatars:
+            app.bot_avatars = avatars
+            app.bot_avatars_version += 1
+        return refreshed
 
-            avatars[key] = url
+    def _bot_avatar_loop():
+        while True:
+            try:
+                n = sync_bot_avatars()
+                if n:
+                    logger.info("Avatars bots rafraîchis: %d", n)
+            except Exception as e:
+                logger.warning("Erreur sync avatars bots: %s", e)
+            app.bot_avatars_ready.set()
+            time.sleep(BOT_AVATAR_SYNC_INTERVAL)
 
-        app.config["BOT_AVATARS"] = avatars
-        return avatars
+    threading.Thread(target=_bot_avatar_loop, name="bot-avatar-sync", daemon=True).start()
 
     def activate_subscription(db: Session, bot_key: str, guild_discord_id: str, current_period_end_ts: int | None):
         g = db.scalar(select(Guild).where(Guild.discord_id == guild_discord_id))
@@ -478,19 +769,125 @@ def make_app():
         db.commit()
         return True
 
+    # --- Cache de rendu des pages publiques ---
+    # (endpoint, args, utilisateur, locale, versions avatars/images/contenu) -> (etag, html)
+    page_cache: OrderedDict = OrderedDict()
+    page_cache_lock = threading.Lock()
+    # Copie locale de cache_versions["pages"] : une purge sur un worker invalide aussi les autres
+    page_version = {"value": 0, "checked": 0.0}
+
+    def _read_page_version() -> int:
+        with Session(app.engine) as db:
+            return db.scalar(select(CacheVersion.version).where(CacheVersion.name == "pages")) or 0
+
+    def _page_content_version() -> int:
+        now = time.monotonic()
+        if now - page_version["checked"] >= PAGE_VERSION_CHECK_INTERVAL:
+            try:
+                version = _read_page_version()
+            except Exception as e:
+                logger.warning("Lecture version du cache des pages: %s", e)
+                version = page_version["value"]
+            with page_cache_lock:
+                if version != page_version["value"]:
+                    page_cache.clear()
+                page_version.update(value=version, checked=now)
+        return page_version["value"]
+
+    def invalidate_page_cache(reason: str):
+        _bump_cache_version("pages")
+        with page_cache_lock:
+            page_cache.clear()
+            page_version["checked"] = 0.0
+        _page_content_version()
+        logger.info("Cache des pages vidé (%s)", reason)
+
+    app.invalidate_page_cache = invalidate_page_cache
+
+    def _page_cache_key():
+        u = session.get("user")
+        user_key = None
+        if u:
+            # Les pages connectées affichent nom/avatar de l'utilisateur et le lien admin
+            uid = str(u.get("id") or "")
+            user_key = (uid, u.get("username"), u.get("avatar_hash") or u.get("avatar"), uid in ADMIN_DISCORD_IDS)
+        locale = request.accept_languages.best_match(PAGE_LOCALES) or PAGE_LOCALES[0]
+        return (
+            request.endpoint,
+            tuple(sorted((request.view_args or {}).items())),
+            user_key,
+            locale,
+            app.bot_avatars_version,
+            app.images.version,
+            _page_content_version(),
+        )
+
+    def cached_page(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Message flash en attente : rendu unique, pas de cache
+            if session.get("_flashes"):
+                return view(*args, **kwargs)
+
+            key = _page_cache_key()
+            with page_cache_lock:
+                hit = page_cache.get(key)
+                if hit:
+                    page_cache.move_to_end(key)
+
+            if hit is None:
+                rv = view(*args, **kwargs)
+                if not isinstance(rv, str):
+                    return rv  # redirection, etc.
+                hit = (hashlib.sha1(rv.encode()).hexdigest()[:16], rv)
+                with page_cache_lock:
+                    page_cache[key] = hit
+                    while len(page_cache) > PAGE_CACHE_SIZE:
+                        page_cache.popitem(last=False)
+
+            etag, html = hit
+            response = app.response_class(html, mimetype="text/html")
+            response.set_etag(etag)
+            response.headers["Cache-Control"] = "private, no-cache"
+            response.vary.update(("Cookie", "Accept-Language"))
+            return response.make_conditional(request)
+        return wrapper
+
+    def _prewarm_pages():
+        # Après la première synchro des avatars, sinon les entrées seraient aussitôt périmées
+        app.bot_avatars_ready.wait(timeout=30)
+        paths = ["/", "/pricing", "/faq"] + [f"/bots/{k}" for k in BOT_DEFS]
+        for path in paths:
+            try:
+                with app.test_request_context(path, headers={"Accept-Language": PAGE_LOCALES[0]}):
+                    app.view_functions[request.endpoint](**(request.view_args or {}))
+            except Exception as e:
+                logger.warning("Pré-rendu %s impossible: %s", path, e)
+        logger.info("Pages publiques pré-rendues: %d", len(page_cache))
+
+    @app.get("/csrf-token")
+    def csrf_token_api():
+        # Seul endroit où un visiteur anonyme obtient une session : au moment de son premier POST
+        response = jsonify({"csrf_token": app.generate_csrf() if app.generate_csrf else ""})
+        response.headers["Cache-Control"] = "no-store"
+        return response
+
     @app.get("/")
+    @cached_page
     def index():
         logged = bool(session.get("user"))
         bot_avatars = _get_bot_avatar_urls()
         return render_template("home.html", logged=logged, dev_mode=DEV_MODE, trial_days=TRIAL_DAYS, current_user=session.get("user"), bot_avatars=bot_avatars, bot_defs=BOT_DEFS)
 
     @app.get("/pricing")
+    @cached_page
     def pricing():
         logged = bool(session.get("user"))
         bot_avatars = _get_bot_avatar_urls()
         return render_template("pricing.html", logged=logged, trial_days=TRIAL_DAYS, bot_avatars=bot_avatars, bot_defs=BOT_DEFS, current_user=session.get("user"))
 
     @app.get("/bots/<bot_key>")
+    @cached_page
     def bot_page(bot_key):
         bot_def = BOT_DEFS.get(bot_key)
         if not bot_def:
@@ -500,6 +897,7 @@ def make_app():
         return render_template("bot_page.html", bot_key=bot_key, bot_def=bot_def, logged=logged, trial_days=TRIAL_DAYS, bot_avatars=bot_avatars, bot_defs=BOT_DEFS, current_user=session.get("user"))
 
     @app.get("/faq")
+    @cached_page
     def faq():
         logged = bool(session.get("user"))
         return render_template("faq.html", logged=logged, current_user=session.get("user"))
@@ -509,7 +907,6 @@ def make_app():
     def dashboard():
         logged = True
         ids = session.get("admin_guild_ids") or []
-        guild_icons = session.get("guild_icons") or {}
 
         with Session(app.engine) as db:
             bots = db.scalars(select(BotType)).all()
@@ -519,24 +916,31 @@ def make_app():
                 db.commit()
                 bots = db.scalars(select(BotType)).all()
 
-            guilds = []
+            user_id = (session.get("user") or {}).get("id")
+
+            # Guildes administrées (+ chaîne Twitch de l'utilisateur) en une seule requête
+            scope = []
             if ids:
-                discord_guilds = db.scalars(select(Guild).where(Guild.discord_id.in_(ids))).all()
-                guilds.extend(discord_guilds)
-            
-            if session.get("twitch_oauth"):
-                user_id = session.get("user", {}).get("id")
-                if user_id:
-                    user_twitch_guild = db.scalar(select(Guild).where(Guild.discord_id == user_id, Guild.platform == "twitch"))
-                    if user_twitch_guild:
-                        guilds.append(user_twitch_guild)
-            
+                scope.append(Guild.discord_id.in_(ids))
+            if session.get("twitch_oauth") and user_id:
+                scope.append(and_(Guild.discord_id == user_id, Guild.platform == "twitch"))
+            guilds = db.scalars(select(Guild).where(or_(*scope))).all() if scope else []
+            # Ordre d'affichage historique : guildes Discord d'abord, chaîne Twitch ensuite
+            guilds = sorted(guilds, key=lambda g: g.platform == "twitch" and g.discord_id == user_id)
+
             if session.get("twitch_oauth"):
                 deadpool_bot = next((b for b in bots if b.key == "deadpool"), None)
                 if deadpool_bot:
                     bots = [deadpool_bot]
-            
-            subs = db.scalars(select(Subscription)).all()
+
+            # Abonnements de ces guildes uniquement (index guild_id), relations chargées dans la même requête
+            subs = []
+            if guilds:
+                subs = db.scalars(
+                    select(Subscription)
+                    .where(Subscription.guild_id.in_([g.id for g in guilds]))
+                    .options(joinedload(Subscription.guild), joinedload(Subscription.bot_type))
+                ).all()
 
             submap: dict[str, dict[str, Subscription]] = {}
             for s in subs:
@@ -546,18 +950,19 @@ def make_app():
             has_any_active = any((s.status in ("active", "lifetime") and s.guild.discord_id in ids) for s in subs)
             bot_avatars = _get_bot_avatar_urls()
 
+            # Dernier trial lock de l'utilisateur : donne à la fois le lock actif et "déjà essayé"
             active_lock = None
             trial_ever = False
-            if logged:
-                user_id = (session.get("user") or {}).get("id")
-                now = dt.datetime.utcnow()
-                with Session(app.engine) as db2:
-                    active_lock = db2.scalar(
-                        select(TrialLock).where(TrialLock.discord_user_id == user_id, TrialLock.until > now)
-                    )
-                    trial_ever = bool(db2.scalar(
-                        select(TrialLock.id).where(TrialLock.discord_user_id == user_id)
-                    ))
+            if logged and user_id:
+                last_lock = db.scalar(
+                    select(TrialLock)
+                    .where(TrialLock.discord_user_id == user_id)
+                    .order_by(TrialLock.until.desc())
+                    .limit(1)
+                )
+                trial_ever = last_lock is not None
+                if last_lock and last_lock.until > dt.datetime.utcnow():
+                    active_lock = last_lock
 
             return render_template(
                 "dashboard.html",
@@ -568,7 +973,6 @@ def make_app():
                 trial_days=TRIAL_DAYS,
                 dev_mode=DEV_MODE,
                 now_utc=dt.datetime.utcnow(),
-                guild_icons=guild_icons,
                 bot_avatars=bot_avatars,
                 active_lock=active_lock,
                 trial_ever=trial_ever,
@@ -577,61 +981,192 @@ def make_app():
                 current_user=session.get("user")
             )
 
+    # Base des scores écrite par les bots (shared/scores.py) : lecture seule côté panel
+    app.scores_engine = create_engine(
+        f"sqlite:///file:{SCORES_DB}?mode=ro&uri=true", future=True,
+        connect_args={"check_same_thread": False, "timeout": 30}
+    )
+
+    def _top_quiz_scores(limit: int, window: str = "all", guild_id: str | None = None,
+                         after: str | None = None) -> tuple[list[tuple[str, int]], str | None]:
+        """Page de classement (agrégats par fenêtre/serveur), paginée par curseur "score:user_id"."""
+        if not os.path.exists(SCORES_DB):
+            return [], None
+        # Même requête (bucket, fuseau, curseur) que les bots : un seul code dans shared/scores.py
+        try:
+            sql, params = quiz_scores.leaderboard_query(window, guild_id, limit, after)
+        except ValueError:
+            return [], None
+        try:
+            with app.scores_engine.connect() as conn:
+                rows = conn.exec_driver_sql(sql, tuple(params)).all()
+        except Exception as e:
+            logger.warning("Erreur lecture scores: %s", e)
+            return [], None
+        return quiz_scores.leaderboard_result(rows, limit)
+
+    def _fetch_discord_profile(discord_id: str, bot_token: str):
+        """Renvoie (profil | None, retry_after | None)."""
+        r = requests.get(
+            f"{DISCORD_API_BASE}/users/{discord_id}",
+            headers={"Authorization": f"Bot {bot_token}"},
+            timeout=5
+        )
+        if r.status_code == 429:
+            try:
+                retry_after = float(r.json().get("retry_after", 1))
+            except Exception:
+                retry_after = float(r.headers.get("Retry-After", 1))
+            return None, retry_after
+        if r.status_code == 404:
+            # Compte supprimé : on mémorise quand même pour ne pas le redemander à chaque cycle
+            return {"username": None, "avatar_url": None}, None
+        if r.status_code != 200:
+            return None, None
+
+        user = r.json()
+        avatar_hash = user.get("avatar")
+        if avatar_hash:
+            avatar = f"https://cdn.discordapp.com/avatars/{discord_id}/{avatar_hash}.png?size=128"
+        else:
+            discriminator = int(user.get("discriminator", "0") or 0)
+            idx = (int(discord_id) >> 22) % 6 if discriminator == 0 else discriminator % 5
+            avatar = f"https://cdn.discordapp.com/embed/avatars/{idx}.png"
+        return {"username": user.get("username"), "avatar_url": avatar}, None
+
+    def _safe_fetch_profile(discord_id, bot_token):
+        try:
+            return _fetch_discord_profile(discord_id, bot_token)
+        except Exception as e:
+            logger.warning("Erreur récupération profil %s: %s", discord_id, e)
+            return None, None
+
+    def _upsert_profiles(db: Session, fetched: dict, now: dt.datetime):
+        rows = [
+            {"discord_id": uid, "username": p["username"], "avatar_url": p["avatar_url"], "fetched_at": now}
+            for uid, p in fetched.items()
+        ]
+        dialect_insert = _dialect_insert()
+        if dialect_insert:
+            for i in range(0, len(rows), 500):
+                stmt = dialect_insert(UserProfile).values(rows[i:i + 500])
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[UserProfile.discord_id],
+                    set_={
+                        "username": stmt.excluded.username,
+                        "avatar_url": stmt.excluded.avatar_url,
+                        "fetched_at": stmt.excluded.fetched_at,
+                    }
+                )
+                db.execute(stmt)
+            return
+
+        existing = {p.discord_id: p for p in db.scalars(
+            select(UserProfile).where(UserProfile.discord_id.in_(list(fetched)))
+        )}
+        for r in rows:
+            row = existing.get(r["discord_id"])
+            if not row:
+                db.add(UserProfile(**r))
+            else:
+                row.username, row.avatar_url, row.fetched_at = r["username"], r["avatar_url"], now
+
+    def refresh_user_profiles(discord_ids: list[str]) -> int:
+        """Rafraîchit les profils absents ou expirés (concurrence bornée, respect des 429)."""
+        bot_token = next((t for t in BOT_TOKENS.values() if t), None)
+        if not (bot_token and discord_ids):
+            return 0
+
+        with Session(app.engine) as db:
+            fresh = set(db.scalars(
+                select(UserProfile.discord_id).where(
+                    UserProfile.discord_id.in_(discord_ids),
+                    UserProfile.fetched_at > dt.datetime.utcnow() - PROFILE_TTL
+                )
+            ))
+
+        queue = deque(uid for uid in discord_ids if uid not in fresh)
+        fetched = {}
+        rate_limited = 0
+        with ThreadPoolExecutor(max_workers=PROFILE_FETCH_CONCURRENCY) as pool:
+            while queue and rate_limited < 5:
+                batch = [queue.popleft() for _ in range(min(PROFILE_FETCH_CONCURRENCY, len(queue)))]
+                wait = 0.0
+                for uid, res in zip(batch, pool.map(lambda i: _safe_fetch_profile(i, bot_token), batch)):
+                    profile, retry_after = res
+                    if retry_after:
+                        queue.appendleft(uid)
+                        wait = max(wait, retry_after)
+                    elif profile:
+                        fetched[uid] = profile
+                if wait:
+                    rate_limited += 1
+                    time.sleep(wait)
+
+        if fetched:
+            with Session(app.engine) as db:
+                _upsert_profiles(db, fetched, dt.datetime.utcnow())
+                db.commit()
+        return len(fetched)
+
+    def _profile_refresh_loop():
+        while True:
+            try:
+                # Un seul worker par cycle : le token du bot Deadpool sert aussi au bot en ligne
+                if not _claim_lease("profile-refresh", dt.timedelta(seconds=PROFILE_REFRESH_INTERVAL * 2)):
+                    time.sleep(PROFILE_REFRESH_INTERVAL)
+                    continue
+                # Top global de chaque fenêtre : couvre les premières pages les plus consultées
+                ids = []
+                for window in LEADERBOARD_WINDOWS:
+                    top, _ = _top_quiz_scores(PROFILE_REFRESH_TOP, window)
+                    ids.extend(uid for uid, _ in top if uid not in ids)
+                n = refresh_user_profiles(ids)
+                if n:
+                    logger.info("Profils leaderboard rafraîchis: %d", n)
+            except Exception as e:
+                logger.warning("Erreur refresh profils: %s", e)
+            time.sleep(PROFILE_REFRESH_INTERVAL)
+
+    threading.Thread(target=_profile_refresh_loop, name="profile-refresh", daemon=True).start()
+
     @app.get("/leaderboard")
     def leaderboard():
-        leaderboard_file = "/app/shared/leaderboard.json"
+        window = request.args.get("window", "all")
+        if window not in LEADERBOARD_WINDOWS:
+            window = "all"
+        guild_id = request.args.get("guild") or None
+        if guild_id and not guild_id.isdigit():
+            guild_id = None
+        after = request.args.get("after") or None
+        rank_offset = max(request.args.get("start", 0, type=int), 0) if after else 0
+
+        # Page indexée des agrégats, puis lecture seule de la table de profils, uniquement pour la page affichée
+        top, next_cursor = _top_quiz_scores(LEADERBOARD_SIZE, window, guild_id, after)
+        ids = [uid for uid, _ in top]
+        profiles = {}
+        if ids:
+            with Session(app.engine) as db:
+                profiles = {p.discord_id: p for p in db.scalars(select(UserProfile).where(UserProfile.discord_id.in_(ids)))}
+
         scores = []
-        try:
-            if os.path.exists(leaderboard_file):
-                with open(leaderboard_file, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    bot_token = None
-                    for token in BOT_TOKENS.values():
-                        if token:
-                            bot_token = token
-                            break
-                    
-                    if isinstance(data, dict) and "scores" not in data:
-                        for discord_id, score in data.items():
-                            user_info = {
-                                "name": f"Joueur {discord_id[-4:]}",
-                                "score": score,
-                                "avatar": None
-                            }
-                            if bot_token:
-                                try:
-                                    r = requests.get(
-                                        f"{DISCORD_API_BASE}/users/{discord_id}",
-                                        headers={"Authorization": f"Bot {bot_token}"},
-                                        timeout=5
-                                    )
-                                    if r.status_code == 200:
-                                        user = r.json()
-                                        user_info["name"] = user.get("username", user_info["name"])
-                                        avatar_hash = user.get("avatar")
-                                        if avatar_hash:
-                                            user_info["avatar"] = f"https://cdn.discordapp.com/avatars/{discord_id}/{avatar_hash}.png?size=128"
-                                        else:
-                                            discriminator = int(user.get("discriminator", "0"))
-                                            if discriminator == 0:
-                                                idx = (int(discord_id) >> 22) % 6
-                                            else:
-                                                idx = discriminator % 5
-                                            user_info["avatar"] = f"https://cdn.discordapp.com/embed/avatars/{idx}.png"
-                                except Exception as e:
-                                    print(f"Erreur récupération profil {discord_id}: {e}")
-                            scores.append(user_info)
-                    
-                    elif isinstance(data, dict) and "scores" in data:
-                        scores = data.get("scores", [])
-                    
-                    scores = sorted(scores, key=lambda x: x.get("score", 0), reverse=True)[:20]
-        except Exception as e:
-            print(f"Erreur lecture leaderboard: {e}")
-            import traceback
-            traceback.print_exc()
-        
-        return render_template("leaderboard.html", scores=scores)
+        for uid, score in top:
+            p = profiles.get(uid)
+            scores.append({
+                "name": (p.username if p and p.username else f"Joueur {uid[-4:]}"),
+                "score": score,
+                "avatar": p.avatar_url if p else None
+            })
+        return render_template(
+            "leaderboard.html",
+            scores=scores,
+            windows=LEADERBOARD_WINDOWS,
+            window=window,
+            guild_id=guild_id,
+            rank_offset=rank_offset,
+            next_cursor=next_cursor,
+            next_start=rank_offset + len(scores)
+        )
 
     @app.post("/trial/start/<bot_key>/<guild_id>")
     @login_required
@@ -939,6 +1474,11 @@ def make_app():
             wlog(f"⏰ Trial se termine bientôt: {data_obj.get('id')}")
             handled = True
 
+        elif (event_type or "").startswith(("price.", "product.")):
+            # Tarifs affichés sur les pages publiques : on repart d'un cache vide
+            invalidate_page_cache(event_type)
+            handled = True
+
         if handled:
             wlog(f"✅ Event {event_type} traité avec succès")
         else:
@@ -1173,7 +1713,8 @@ def make_app():
             return redirect(url_for("dashboard"))
             
         user_info = user_data["data"][0]
-        
+
+        app.session_interface.regenerate(session)
         session["twitch_oauth"] = {
             "access_token": access_token,
             "refresh_token": refresh_token,
@@ -1252,6 +1793,8 @@ def make_app():
             return redirect(url_for("dashboard"))
 
         acc = r.json().get("access_token")
+        # Nouveau sid avant d'écrire les données de connexion (anti fixation de session)
+        app.session_interface.regenerate(session)
         session["oauth"] = {"access_token": acc}
 
         u = sync_user_and_guilds(acc)
@@ -1382,23 +1925,107 @@ def make_app():
     def admin_index():
         return redirect(url_for("admin_subs_v2"))
 
+    def _admin_subs_conditions(args) -> list:
+        """Filtres communs de la liste admin (platform, status, bot, q)."""
+        conds = []
+        platform = (args.get("platform") or "").strip().lower()
+        if platform == "twitch":
+            conds.append(Guild.platform == "twitch")
+        elif platform == "discord":
+            conds.append(Guild.platform != "twitch")
+        status = (args.get("status") or "").strip().lower()
+        if status in ADMIN_STATUS_FILTERS:
+            conds.append(Subscription.status.in_(ADMIN_STATUS_FILTERS[status]))
+        bot = (args.get("bot") or "").strip().lower()
+        if bot:
+            conds.append(BotType.key == bot)
+        q = (args.get("q") or "").strip()
+        if q:
+            like = f"%{q}%"
+            conds.append(or_(Guild.name.ilike(like), Guild.discord_id == q, BotType.key.ilike(like)))
+        return conds
+
+    def _admin_subs_select(conds: list):
+        return (
+            select(Subscription)
+            .join(Subscription.guild)
+            .join(Subscription.bot_type)
+            .where(*conds)
+            .options(contains_eager(Subscription.guild), contains_eager(Subscription.bot_type))
+        )
+
+    def _admin_subs_stats(db: Session) -> tuple[dict, dict, dict]:
+        """KPIs globaux en un seul GROUP BY (plateforme, statut, bot)."""
+        rows = db.execute(
+            select(Guild.platform, Subscription.status, BotType.key, func.count(Subscription.id))
+            .join(Subscription.guild)
+            .join(Subscription.bot_type)
+            .group_by(Guild.platform, Subscription.status, BotType.key)
+        ).all()
+
+        stats = {"total": 0, "active": 0, "trial": 0, "canceled": 0}
+        platform_stats = {p: {"total": 0, "active": 0, "trial": 0} for p in ("discord", "twitch")}
+        bot_counts: dict[str, int] = {}
+        for platform, status, bot_key, n in rows:
+            ps = platform_stats["twitch" if platform == "twitch" else "discord"]
+            stats["total"] += n
+            ps["total"] += n
+            bot_counts[bot_key] = bot_counts.get(bot_key, 0) + n
+            if status in ("active", "lifetime"):
+                stats["active"] += n
+                ps["active"] += n
+            elif status in ("trial", "trialing"):
+                stats["trial"] += n
+                ps["trial"] += n
+            elif status in ("canceled", "unpaid", "incomplete"):
+                stats["canceled"] += n
+        return stats, platform_stats, bot_counts
+
     @app.get("/admin/subs-v2")
     @admin_required
     def admin_subs_v2():
+        after = request.args.get("after", type=int)
+        before = request.args.get("before", type=int)
+        conds = _admin_subs_conditions(request.args)
+        filters = {k: v for k in ("platform", "status", "bot", "q") if (v := (request.args.get(k) or "").strip())}
+
         with Session(app.engine) as db:
-            query = select(Subscription).options(
-                selectinload(Subscription.guild),
-                selectinload(Subscription.bot_type)
-            ).order_by(Subscription.id.desc())
+            # Pagination par curseur sur l'id (ordre décroissant), jamais d'OFFSET
+            query = _admin_subs_select(conds)
+            if before:
+                query = query.where(Subscription.id > before).order_by(Subscription.id.asc())
+            else:
+                if after:
+                    query = query.where(Subscription.id < after)
+                query = query.order_by(Subscription.id.desc())
+            rows = db.scalars(query.limit(ADMIN_PAGE_SIZE + 1)).all()
+
+            has_more = len(rows) > ADMIN_PAGE_SIZE
+            subs = list(rows[:ADMIN_PAGE_SIZE])
+            if before:
+                # Page lue à l'envers : has_more signifie qu'il reste des pages plus récentes
+                subs.reverse()
+                prev_before = subs[0].id if subs and has_more else None
+                next_after = subs[-1].id if subs else None
+            else:
+                next_after = subs[-1].id if subs and has_more else None
+                prev_before = subs[0].id if subs and after else None
 
-            all_subs = db.scalars(query).all()
-            
-            twitch_guild_ids_with_subs = {s.guild.discord_id for s in all_subs if s.guild.platform == "twitch"}
-            all_twitch_guilds = db.scalars(select(Guild).where(Guild.platform == "twitch")).all()
-            
+            for s in subs:
+                s.trial_remaining_info = calculate_trial_info(s)
+
+            stats, platform_stats, bot_counts = _admin_subs_stats(db)
+
+            # Chaînes Twitch connectées sans abonnement : première page seulement
             twitch_connected = []
-            for guild in all_twitch_guilds:
-                if guild.discord_id not in twitch_guild_ids_with_subs:
+            if not (after or before) and filters.get("platform") != "discord" and not ("status" in filters or "bot" in filters):
+                twitch_query = select(Guild).where(
+                    Guild.platform == "twitch",
+                    ~select(Subscription.id).where(Subscription.guild_id == Guild.id).exists()
+                )
+                if "q" in filters:
+                    twitch_query = twitch_query.where(or_(Guild.name.ilike(f"%{filters['q']}%"), Guild.discord_id == filters["q"]))
+                for guild in db.scalars(twitch_query.order_by(Guild.id.desc()).limit(ADMIN_PAGE_SIZE)):
                     virtual_sub = type('VirtualSub', (), {
                         'id': f"twitch_{guild.discord_id}",
                         'guild': guild,
@@ -1410,50 +2037,156 @@ def make_app():
                         'created_at': None
                     })()
                     twitch_connected.append(virtual_sub)
-            
-            discord_subs = [s for s in all_subs if s.guild.platform != "twitch"]
-            twitch_subs = [s for s in all_subs if s.guild.platform == "twitch"]
-            
-            stats = {
-                "total": len(all_subs),
-                "active": len([s for s in all_subs if s.status in ("active", "lifetime")]),
-                "trial": len([s for s in all_subs if s.status in ("trial", "trialing")]),
-                "canceled": len([s for s in all_subs if s.status in ("canceled", "unpaid", "incomplete")])
-            }
-            
-            platform_stats = {
-                "discord": {
-                    "total": len(discord_subs),
-                    "active": len([s for s in discord_subs if s.status in ("active", "lifetime")]),
-                    "trial": len([s for s in discord_subs if s.status in ("trial", "trialing")])
-                },
-                "twitch": {
-                    "total": len(twitch_subs),
-                    "active": len([s for s in twitch_subs if s.status in ("active", "lifetime")]),
-                    "trial": len([s for s in twitch_subs if s.status in ("trial", "trialing")])
-                }
-            }
+
+            # Guildes et trial locks limités à la page affichée
+            guild_map = {s.guild.discord_id: s.guild.name for s in subs}
+            locks = []
+            if guild_map:
+                locks = db.scalars(
+                    select(TrialLock)
+                    .where(TrialLock.guild_discord_id.in_(list(guild_map)))
+                    .order_by(TrialLock.until.desc())
+                ).all()
+            locks_total = db.scalar(select(func.count(TrialLock.id)))
+            subs_version = _admin_subs_version(db)
 
             bot_avatars = _get_bot_avatar_urls()
-            all_guilds = db.scalars(select(Guild)).all()
-            guild_map = {g.discord_id: g.name for g in all_guilds}
-            
-            # Récupérer les trial locks pour la gestion des essais
-            locks = db.scalars(select(TrialLock).order_by(TrialLock.until.desc())).all()
 
-        return render_template(
-            "admin_subs.html",
-            subs=all_subs,
-            twitch_connected=twitch_connected,
-            bot_defs=BOT_DEFS,
-            bot_avatars=bot_avatars,
-            guild_map=guild_map,
-            now=dt.datetime.utcnow(),
-            stats=stats,
-            platform_stats=platform_stats,
-            locks=locks,
-            page=1,
-            pages=1
+            return render_template(
+                "admin_subs.html",
+                subs=subs,
+                twitch_connected=twitch_connected,
+                bot_defs=BOT_DEFS,
+                bot_avatars=bot_avatars,
+                guild_map=guild_map,
+                now=dt.datetime.utcnow(),
+                stats=stats,
+                platform_stats=platform_stats,
+                bot_counts=bot_counts,
+                locks=locks,
+                locks_total=locks_total,
+                filters=filters,
+                next_after=next_after,
+                prev_before=prev_before,
+                subs_version=subs_version
+            )
+
+    def _admin_subs_version(db: Session) -> str:
+        """Version de la table : dernier updated_at + nombre de lignes (détecte aussi les suppressions)."""
+        last, total = db.execute(select(func.max(Subscription.updated_at), func.count(Subscription.id))).one()
+        return f"{last.isoformat() if last else ''}|{total}"
+
+    @app.get("/admin/api/subs")
+    @admin_required
+    def admin_api_subs():
+        since = request.args.get("since", "")
+        with Session(app.engine) as db:
+            version = _admin_subs_version(db)
+            # Onglet inactif : une seule requête (max + count) par intervalle
+            if since == version:
+                return jsonify({"version": version, "changed": False})
+
+            since_ts = None
+            try:
+                since_ts = dt.datetime.fromisoformat(since.split("|")[0]) if since.split("|")[0] else None
+            except ValueError:
+                pass
+
+            conds = _admin_subs_conditions(request.args)
+            query = _admin_subs_select(conds)
+            if since_ts:
+                query = query.where(Subscription.updated_at > since_ts)
+            rows = db.scalars(query.order_by(Subscription.updated_at.desc()).limit(ADMIN_PAGE_SIZE + 1)).all()
+
+            # Lignes affichées supprimées ou sorties des filtres (statut changé...) : le delta
+            # ci-dessus ne les renvoie pas, et une suppression + un ajout ne changent pas le total
+            shown = {int(i) for i in request.args.get("ids", "").split(",")[:ADMIN_PAGE_SIZE] if i.isdigit()}
+            removed = []
+            if shown:
+                still = set(db.scalars(
+                    select(Subscription.id).join(Subscription.guild).join(Subscription.bot_type)
+                    .where(Subscription.id.in_(shown), *conds)
+                ))
+                removed = sorted(shown - still)
+            stats, platform_stats, bot_counts = _admin_subs_stats(db)
+            bot_avatars = _get_bot_avatar_urls()
+
+            changed = []
+            for s in rows[:ADMIN_PAGE_SIZE]:
+                changed.append({
+                    "id": s.id,
+                    "status": s.status,
+                    "updated_at": s.updated_at.isoformat() if s.updated_at else None,
+                    "html": render_template("_admin_sub_row.html", s=s, bot_avatars=bot_avatars)
+                })
+
+            return jsonify({
+                "version": version,
+                "changed": True,
+                "truncated": len(rows) > ADMIN_PAGE_SIZE,
+                "rows": changed,
+                "removed": removed,
+                "stats": stats,
+                "platform_stats": platform_stats,
+                "bot_counts": bot_counts
+            })
+
+    def _iter_export_rows(conds: list):
+        """Lecture par lots (curseur sur l'id) : mémoire constante quelle que soit la taille de la table."""
+        columns = (
+            Subscription.id, BotType.key, Guild.discord_id, Guild.name, Guild.platform, Subscription.status,
+            Subscription.trial_until, Subscription.current_period_end, Subscription.cancel_at_period_end,
+            Subscription.stripe_subscription_id, Subscription.created_at, Subscription.updated_at,
+        )
+        last_id = None
+        while True:
+            query = select(*columns).join(Subscription.guild).join(Subscription.bot_type).where(*conds)
+            if last_id is not None:
+                query = query.where(Subscription.id < last_id)
+            # Session courte par lot : pas de transaction ouverte pendant tout le téléchargement
+            with Session(app.engine) as db:
+                batch = db.execute(query.order_by(Subscription.id.desc()).limit(EXPORT_BATCH_SIZE)).all()
+            for row in batch:
+                yield {
+                    field: (value.isoformat() if isinstance(value, dt.datetime) else value)
+                    for field, value in zip(EXPORT_FIELDS, row)
+                }
+            if len(batch) < EXPORT_BATCH_SIZE:
+                return
+            last_id = batch[-1][0]
+
+    @app.get("/admin/subs/export")
+    @admin_required
+    def admin_export_subs():
+        fmt = (request.args.get("format") or "csv").lower()
+        conds = _admin_subs_conditions(request.args)
+        stamp = dt.datetime.utcnow().strftime("%Y%m%d-%H%M")
+
+        if fmt == "ndjson":
+            def generate():
+                for row in _iter_export_rows(conds):
+                    yield json.dumps(row, ensure_ascii=False) + "\n"
+            mimetype, ext = "application/x-ndjson", "ndjson"
+        else:
+            def generate():
+                buf = io.StringIO()
+                writer = csv.DictWriter(buf, fieldnames=EXPORT_FIELDS)
+                writer.writeheader()
+                for row in _iter_export_rows(conds):
+                    writer.writerow(row)
+                    yield buf.getvalue()
+                    buf.seek(0)
+                    buf.truncate(0)
+                yield buf.getvalue()
+            mimetype, ext = "text/csv; charset=utf-8", "csv"
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype=mimetype,
+            headers={
+                "Content-Disposition": f"attachment; filename=subscriptions-{stamp}.{ext}",
+                "X-Accel-Buffering": "no",
+            }
         )
 
     @app.post("/admin/subs/create")
@@ -1633,9 +2366,18 @@ def make_app():
 
         return jsonify({"success": True})
 
+    @app.post("/admin/cache/pages/purge")
+    @admin_required
+    def admin_purge_page_cache():
+        invalidate_page_cache("admin")
+        threading.Thread(target=_prewarm_pages, name="page-prewarm", daemon=True).start()
+        return jsonify({"success": True})
+
     # --- Admin API routes (intégrées dans make_app) ---
     _register_admin_routes(app)
 
+    threading.Thread(target=_prewarm_pages, name="page-prewarm", daemon=True).start()
+
     return app
 
 
@@ -1692,6 +2434,122 @@ def _register_admin_routes(app):
         except Exception as e:
             return jsonify({"error": str(e)}), 500
 
+    # --- Cache des salons Discord (planificateur) ---
+    # guild_id -> {"channels": [...], "fetched_at": monotonic, "version": cache_versions["channels:<gid>"]}
+    # La liste reste par worker ; son invalidation et la pause Discord passent par la base
+    channel_cache: dict[str, dict] = {}
+    # guild_id -> Event : un seul appel Discord en vol par guilde (single-flight)
+    channel_inflight: dict[str, threading.Event] = {}
+    channel_lock = threading.Lock()
+    channel_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="channels")
+
+    def _fetch_guild_channels(guild_id: str) -> list | None:
+        deadpool_token = os.getenv("DEADPOOL_TOKEN")
+        if not deadpool_token:
+            print("❌ DEADPOOL_TOKEN non trouvé")
+            return None
+
+        headers = {
+            "Authorization": f"Bot {deadpool_token}",
+            "Content-Type": "application/json"
+        }
+        url = f"https://discord.com/api/v10/guilds/{guild_id}/channels"
+        response = requests.get(url, headers=headers, timeout=10)
+
+        if response.status_code == 429:
+            # Même limite globale que le bot Deadpool : on arrête d'appeler et on sert le cache
+            try:
+                retry_after = float(response.json().get("retry_after", 5))
+            except Exception:
+                retry_after = float(response.headers.get("Retry-After", 5))
+            _set_channel_backoff(retry_after)
+            print(f"⏳ Rate limit Discord (salons), pause {retry_after:.1f}s")
+            return None
+        if response.status_code != 200:
+            print(f"❌ Erreur API Discord: {response.status_code} - {response.text}")
+            return None
+
+        # Filtrer uniquement les salons textuels (type 0)
+        return [
+            {"id": str(ch["id"]), "name": ch["name"]}
+            for ch in response.json()
+            if ch.get("type") == 0
+        ]
+
+    def _set_channel_backoff(retry_after: float):
+        """Pause vue par tous les workers : aucun n'appelle Discord avant la fin du Retry-After."""
+        until = dt.datetime.utcnow() + dt.timedelta(seconds=retry_after)
+        with Session(app.engine) as db:
+            updated = db.execute(
+                update(BackgroundLease).where(BackgroundLease.name == CHANNEL_BACKOFF_LEASE)
+                .values(holder=WORKER_ID, expires_at=until)
+            ).rowcount
+            if not updated:
+                db.add(BackgroundLease(name=CHANNEL_BACKOFF_LEASE, holder=WORKER_ID, expires_at=until))
+            try:
+                db.commit()
+            except IntegrityError:
+                # L'autre worker a pris un 429 au même moment : sa pause vaut la nôtre
+                db.rollback()
+
+    def _channel_shared_state(guild_id: str) -> tuple[int | None, bool]:
+        """(version de channels:<gid>, pause Discord en cours), None si la base ne répond pas."""
+        try:
+            with Session(app.engine) as db:
+                version = db.scalar(select(CacheVersion.version).where(CacheVersion.name == f"channels:{guild_id}")) or 0
+                until = db.scalar(select(BackgroundLease.expires_at).where(BackgroundLease.name == CHANNEL_BACKOFF_LEASE))
+        except Exception as e:
+            logger.warning("Lecture état du cache des salons: %s", e)
+            return None, False
+        return version, until is not None and until > dt.datetime.utcnow()
+
+    def _refresh_guild_channels(guild_id: str, version: int | None, done: threading.Event):
+        try:
+            channels = _fetch_guild_channels(guild_id)
+            if channels is not None:
+                with channel_lock:
+                    channel_cache[guild_id] = {"channels": channels, "fetched_at": time.monotonic(), "version": version}
+                print(f"✅ Récupéré {len(channels)} salons pour guild {guild_id}")
+        except Exception as e:
+            print(f"Erreur récupération salons Discord: {e}")
+        finally:
+            with channel_lock:
+                channel_inflight.pop(guild_id, None)
+            done.set()
+
+    def get_guild_channels(guild_id: str) -> tuple[list, str]:
+        """Renvoie (salons, état) avec état dans hit | miss | stale | error."""
+        version, paused = _channel_shared_state(guild_id)
+        now = time.monotonic()
+        with channel_lock:
+            entry = channel_cache.get(guild_id)
+            # Version changée = /refresh reçu par n'importe quel worker
+            current = entry and (version is None or entry["version"] == version)
+            if current and now - entry["fetched_at"] < CHANNEL_CACHE_TTL:
+                return entry["channels"], "hit"
+            if entry and paused:
+                return entry["channels"], "stale"
+            done = channel_inflight.get(guild_id)
+            if done is None and not paused:
+                done = channel_inflight[guild_id] = threading.Event()
+                channel_pool.submit(_refresh_guild_channels, guild_id, version, done)
+
+        # Expiré : on laisse un court délai au rafraîchissement, sinon on sert l'ancienne liste
+        if done is not None:
+            done.wait(CHANNEL_STALE_WAIT if entry else CHANNEL_COLD_WAIT)
+        with channel_lock:
+            fresh = channel_cache.get(guild_id)
+        if fresh and (not entry or fresh["fetched_at"] > entry["fetched_at"]):
+            return fresh["channels"], "miss"
+        if entry:
+            return entry["channels"], "stale"
+        return [], "error"
+
+    def _can_access_guild(guild_id) -> bool:
+        admin_ids = session.get("admin_guild_ids") or []
+        u = session.get("user") or {}
+        return guild_id in admin_ids or str(u.get("id")) == str(guild_id)
+
     @app.get("/api/discord/channels/<guild_id>")
     def api_discord_channels(guild_id):
         """Récupère les salons d'un serveur Discord pour le planificateur"""
@@ -1699,45 +2557,25 @@ def _register_admin_routes(app):
             return jsonify({"error": "Unauthorized"}), 401
 
         # Vérifier que l'utilisateur a accès à ce guild
-        admin_ids = session.get("admin_guild_ids") or []
-        u = session.get("user") or {}
-        if guild_id not in admin_ids and str(u.get("id")) != str(guild_id):
+        if not _can_access_guild(guild_id):
             return jsonify({"error": "Forbidden"}), 403
-        
-        try:
-            # Utiliser le token du bot deadpool pour récupérer les salons
-            deadpool_token = os.getenv("DEADPOOL_TOKEN")
-            if not deadpool_token:
-                print("❌ DEADPOOL_TOKEN non trouvé")
-                return jsonify([])
-            
-            # Appel à l'API Discord pour récupérer les salons du serveur
-            headers = {
-                "Authorization": f"Bot {deadpool_token}",
-                "Content-Type": "application/json"
-            }
-            
-            # Récupérer les salons textuels uniquement
-            url = f"https://discord.com/api/v10/guilds/{guild_id}/channels"
-            response = requests.get(url, headers=headers, timeout=10)
-            
-            if response.status_code == 200:
-                channels_data = response.json()
-                # Filtrer uniquement les salons textuels (type 0)
-                text_channels = [
-                    {"id": str(ch["id"]), "name": ch["name"]}
-                    for ch in channels_data 
-                    if ch.get("type") == 0  # 0 = text channel
-                ]
-                print(f"✅ Récupéré {len(text_channels)} salons pour guild {guild_id}")
-                return jsonify(text_channels)
-            else:
-                print(f"❌ Erreur API Discord: {response.status_code} - {response.text}")
-                return jsonify([])
-            
-        except Exception as e:
-            print(f"Erreur récupération salons Discord: {e}")
-            return jsonify([])
+
+        channels, state = get_guild_channels(guild_id)
+        response = jsonify(channels)
+        response.headers["X-Cache"] = state
+        return response
+
+    @app.post("/api/discord/channels/<guild_id>/refresh")
+    def api_discord_channels_refresh(guild_id):
+        """Invalide le cache (nouveau salon créé) : le prochain GET repart vers Discord."""
+        if not session.get("user"):
+            return jsonify({"error": "Unauthorized"}), 401
+        if not _can_access_guild(guild_id):
+            return jsonify({"error": "Forbidden"}), 403
+
+        # Partagé entre workers ; chacun garde sa liste pour le stale-while-revalidate
+        app.bump_cache_version(f"channels:{guild_id}")
+        return jsonify({"ok": True})
 
     # --- AJOUT POUR CONFIGURATION TWITCH ---
     CONFIG_FILE = os.path.join(os.path.dirname(__file__), "bot_config.json")
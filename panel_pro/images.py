@@ -0,0 +1,290 @@
+"""Variantes redimensionnées (AVIF/WebP/JPEG) des images statiques du panel.
+
+Build : `python images.py` (appelé par le Dockerfile), sinon au premier démarrage.
+Avec docker-compose, le bind mount ./panel_pro:/app masque les fichiers générés au
+build : ils sont alors produits au démarrage dans panel_pro/static/img/ (hors git)
+et réutilisés aux démarrages suivants.
+Les fichiers générés portent le hash du contenu source : ils sont servis avec un
+cache immuable et changent de nom quand l'image d'origine change.
+"""
+import os
+import re
+import sys
+import json
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from markupsafe import Markup, escape
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+try:
+    import fcntl
+except ImportError:  # Windows (dev) : fichiers temporaires par PID uniquement
+    fcntl = None
+
+logger = logging.getLogger("panel.images")
+
+STATIC_DIR = os.path.join(os.path.dirname(__file__), "static")
+VARIANTS_SUBDIR = "img"
+MANIFEST_NAME = "manifest.json"
+LOCK_NAME = ".build.lock"
+
+# Source -> largeurs générées (couvre les tailles affichées en 1x/2x)
+IMAGE_WIDTHS = {
+    "4_U_BOT.jpg": (32, 64, 128, 256),
+    "4_U_BOT3.jpg": (480, 960, 1440),
+    "background.jpg": (640, 1280, 1920),
+}
+FORMATS = {"avif": 50, "webp": 78, "jpeg": 82}
+EXTENSIONS = {"avif": "avif", "webp": "webp", "jpeg": "jpg"}
+MIME_TYPES = {"avif": "image/avif", "webp": "image/webp", "jpeg": "image/jpeg"}
+# <stem>-<largeur>w-<hash>.<ext> : seuls ces fichiers sont servis depuis static/img/
+VARIANT_RE = re.compile(r"^[\w.-]+-\d+w-[0-9a-f]{10}\.(?:%s)$" % "|".join(EXTENSIONS.values()))
+
+
+def is_variant_filename(name):
+    return bool(VARIANT_RE.match(name))
+
+
+def _supports(fmt):
+    if fmt != "avif":
+        return True
+    # AVIF natif depuis Pillow 11.3, sinon via pillow-avif-plugin
+    try:
+        import pillow_avif  # noqa: F401
+    except ImportError:
+        pass
+    return "AVIF" in Image.registered_extensions().values()
+
+
+def _content_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(65536), b""):
+            h.update(block)
+    return h.hexdigest()[:10]
+
+
+@contextmanager
+def _build_lock(out_dir):
+    """Un seul processus génère à la fois (les workers gunicorn démarrent ensemble) ;
+    le suivant trouve les fichiers déjà présents et ne réécrit que le manifest."""
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(out_dir, LOCK_NAME), "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def build_variants(static_dir=STATIC_DIR):
+    """Génère les variantes manquantes et réécrit le manifest. Renvoie le manifest."""
+    if not PIL_AVAILABLE:
+        logger.warning("Pillow non installé : images servies telles quelles")
+        return {}
+
+    out_dir = os.path.join(static_dir, VARIANTS_SUBDIR)
+    os.makedirs(out_dir, exist_ok=True)
+    with _build_lock(out_dir):
+        return _build_variants(static_dir, out_dir)
+
+
+def _remove_stale_tmp(out_dir):
+    """Temporaires laissés par un build interrompu (kill, disque plein) : on a le verrou, personne n'écrit."""
+    for name in os.listdir(out_dir):
+        if name.endswith(".tmp"):
+            try:
+                os.unlink(os.path.join(out_dir, name))
+            except OSError:
+                pass
+
+
+def _build_variants(static_dir, out_dir):
+    formats = [f for f in FORMATS if _supports(f)]
+    _remove_stale_tmp(out_dir)
+
+    manifest = {}
+    for name, widths in IMAGE_WIDTHS.items():
+        src = os.path.join(static_dir, name)
+        if not os.path.exists(src):
+            continue
+
+        digest = _content_hash(src)
+        stem = os.path.splitext(name)[0]
+        with Image.open(src) as im:
+            im = im.convert("RGB")
+            entry = {
+                "hash": digest,
+                "width": im.width,
+                "height": im.height,
+                "bytes": os.path.getsize(src),
+                "variants": [],
+            }
+            for width in sorted({min(w, im.width) for w in widths}):
+                resized = None
+                for fmt in formats:
+                    filename = f"{stem}-{width}w-{digest}.{EXTENSIONS[fmt]}"
+                    path = os.path.join(out_dir, filename)
+                    if not os.path.exists(path):
+                        if resized is None:
+                            height = round(im.height * width / im.width)
+                            resized = im.resize((width, height), Image.LANCZOS) if width < im.width else im
+                        tmp = f"{path}.{os.getpid()}.tmp"
+                        try:
+                            resized.save(tmp, format=fmt.upper(), quality=FORMATS[fmt], optimize=fmt == "jpeg")
+                            os.replace(tmp, path)
+                        finally:
+                            if os.path.exists(tmp):
+                                os.unlink(tmp)
+                    entry["variants"].append({
+                        "width": width,
+                        "format": fmt,
+                        "file": f"{VARIANTS_SUBDIR}/{filename}",
+                        "bytes": os.path.getsize(path),
+                    })
+        manifest[name] = entry
+
+    tmp = os.path.join(out_dir, f"{MANIFEST_NAME}.{os.getpid()}.tmp")
+    try:
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, os.path.join(out_dir, MANIFEST_NAME))
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+    return manifest
+
+
+def _manifest_is_current(manifest, static_dir):
+    for name in IMAGE_WIDTHS:
+        src = os.path.join(static_dir, name)
+        if os.path.exists(src) and manifest.get(name, {}).get("hash") != _content_hash(src):
+            return False
+    return True
+
+
+class ResponsiveImages:
+    """Lit le manifest et produit les balises <picture> / URLs de variantes pour Jinja."""
+
+    def __init__(self, static_dir=STATIC_DIR, static_url="/static"):
+        self.static_dir = static_dir
+        self.static_url = static_url.rstrip("/")
+        self.manifest = {}
+        # Incrémenté à chaque regénération (clé du cache de rendu des pages)
+        self.version = 0
+        self._load()
+
+    def _load(self):
+        path = os.path.join(self.static_dir, VARIANTS_SUBDIR, MANIFEST_NAME)
+        try:
+            with open(path) as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError):
+            self.manifest = {}
+
+    def ensure_async(self):
+        """Premier démarrage sans build : génération en tâche de fond, les originaux servent en attendant."""
+        if not PIL_AVAILABLE or _manifest_is_current(self.manifest, self.static_dir):
+            return
+
+        def run():
+            try:
+                self.manifest = build_variants(self.static_dir)
+                self.version += 1
+                logger.info("Variantes d'images générées: %d sources", len(self.manifest))
+            except Exception as e:
+                logger.warning("Erreur génération images: %s", e)
+
+        threading.Thread(target=run, name="image-variants", daemon=True).start()
+
+    def _variants(self, name, fmt):
+        entry = self.manifest.get(name)
+        return [v for v in entry["variants"] if v["format"] == fmt] if entry else []
+
+    def url(self, name, width=None, fmt="webp"):
+        """URL de la plus petite variante >= width (ou l'original si aucune)."""
+        variants = self._variants(name, fmt)
+        if not variants:
+            return f"{self.static_url}/{name}"
+        fitting = [v for v in variants if width is None or v["width"] >= width]
+        chosen = fitting[0] if fitting else variants[-1]
+        return f"{self.static_url}/{chosen['file']}"
+
+    def picture(self, name, sizes="100vw", width=None, height=None, **attrs):
+        """<picture> avec sources AVIF/WebP et repli JPEG, chacun avec son srcset."""
+        attrs.setdefault("alt", "")
+        attrs.setdefault("decoding", "async")
+        entry = self.manifest.get(name)
+        if width:
+            attrs["width"] = width
+            # Dimensions explicites (ratio de la source) : pas de décalage de mise en page
+            if not height and entry:
+                height = round(width * entry["height"] / entry["width"])
+        if height:
+            attrs["height"] = height
+        img_attrs = " ".join(f'{k.rstrip("_").replace("_", "-")}="{escape(v)}"' for k, v in attrs.items())
+
+        if not entry:
+            return Markup(f'<img src="{self.static_url}/{escape(name)}" {img_attrs}>')
+
+        def srcset(fmt):
+            return ", ".join(f"{self.static_url}/{v['file']} {v['width']}w" for v in self._variants(name, fmt))
+
+        sources = "".join(
+            f'<source type="{MIME_TYPES[fmt]}" srcset="{srcset(fmt)}" sizes="{escape(sizes)}">'
+            for fmt in ("avif", "webp") if self._variants(name, fmt)
+        )
+        src = self.url(name, width * 2 if width else None, "jpeg")
+        return Markup(
+            f'<picture>{sources}'
+            f'<img src="{src}" srcset="{srcset("jpeg")}" sizes="{escape(sizes)}" {img_attrs}>'
+            f'</picture>'
+        )
+
+
+# Pages publiques -> images affichées (source, largeur CSS max), pour le rapport
+# (le même fichier n'est compté qu'une fois par page : le navigateur ne le télécharge qu'une fois)
+PAGE_IMAGES = {
+    "index / pricing / bot_page / faq": [("4_U_BOT.jpg", 40)],
+    "pages connectées (sidebar)": [("4_U_BOT.jpg", 70)],
+    "auth_bouncer": [("4_U_BOT.jpg", 56)],
+}
+
+
+def report(manifest, dpr=2):
+    """Octets économisés par page : original vs meilleure variante servie en 2x."""
+    lines = []
+    for page, images in PAGE_IMAGES.items():
+        before = after = 0
+        for name, css_width in images:
+            entry = manifest.get(name)
+            if not entry:
+                continue
+            target = css_width * dpr
+            candidates = [v for v in entry["variants"] if v["width"] >= target] or entry["variants"]
+            best = min((v for v in candidates if v["width"] == candidates[0]["width"]), key=lambda v: v["bytes"])
+            before += entry["bytes"]
+            after += best["bytes"]
+        if before:
+            lines.append(f"{page}: {before:,} -> {after:,} octets ({before - after:,} économisés, -{100 * (before - after) // before}%)")
+    for name, entry in manifest.items():
+        smallest = min(v["bytes"] for v in entry["variants"])
+        lines.append(f"  {name}: original {entry['bytes']:,} o, plus petite variante {smallest:,} o")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if not PIL_AVAILABLE:
+        print("⚠️ Pillow non installé, aucune variante générée")
+        sys.exit(0)
+    print(report(build_variants()))
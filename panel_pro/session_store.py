@@ -0,0 +1,176 @@
+import json
+import time
+import secrets
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+logger = logging.getLogger("panel.sessions")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    sid TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_sessions_expires_at ON sessions (expires_at);
+"""
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """Session dont seul l'identifiant opaque voyage dans le cookie."""
+
+    def __init__(self, initial=None, sid=None, version=0):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.version = version
+        self.modified = False
+
+
+class SQLiteSessionInterface(SessionInterface):
+    """Sessions stockées dans SQLite (partagé entre workers gunicorn).
+
+    Chaque requête ne lit que (version, expires_at) ; le contenu (liste des guildes,
+    icônes...) est gardé désérialisé en mémoire tant que la version n'a pas bougé."""
+
+    def __init__(self, path, idle_timeout=7 * 86400, touch_interval=300, cache_size=2000):
+        self.path = path
+        self.idle_timeout = idle_timeout
+        self.touch_interval = touch_interval
+        self.cache_size = cache_size
+        # sid -> (version, data)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._last_purge = 0.0
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _cache_get(self, sid, version):
+        with self._lock:
+            hit = self._cache.get(sid)
+            if hit and hit[0] == version:
+                self._cache.move_to_end(sid)
+                return hit[1]
+        return None
+
+    def _cache_put(self, sid, version, data):
+        with self._lock:
+            self._cache[sid] = (version, data)
+            self._cache.move_to_end(sid)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _cache_drop(self, sid):
+        with self._lock:
+            self._cache.pop(sid, None)
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if not sid:
+            return ServerSession()
+
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute("SELECT version, expires_at FROM sessions WHERE sid = ?", (sid,)).fetchone()
+        if not row or row[1] < now:
+            self._cache_drop(sid)
+            return ServerSession()
+
+        version, expires_at = row
+        data = self._cache_get(sid, version)
+        if data is None:
+            raw = conn.execute("SELECT data FROM sessions WHERE sid = ?", (sid,)).fetchone()
+            if not raw:
+                return ServerSession()
+            data = json.loads(raw[0])
+            self._cache_put(sid, version, data)
+
+        # Copie : les mutations de la requête ne doivent pas toucher le cache partagé
+        session = ServerSession(json.loads(json.dumps(data)), sid=sid, version=version)
+        session.expires_at = expires_at
+        return session
+
+    def regenerate(self, session):
+        """Nouvel identifiant à la connexion (anti fixation de session) : l'ancienne ligne est
+        supprimée, le contenu actuel est réécrit sous un nouveau sid par save_session."""
+        if session.sid:
+            self._connect().execute("DELETE FROM sessions WHERE sid = ?", (session.sid,))
+            self._cache_drop(session.sid)
+        session.sid = None
+        session.modified = True
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        conn = self._connect()
+        now = time.time()
+
+        if not session:
+            # Déconnexion (session.clear()) : on supprime la ligne et le cookie
+            if session.sid:
+                conn.execute("DELETE FROM sessions WHERE sid = ?", (session.sid,))
+                self._cache_drop(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        expires_at = now + self.idle_timeout
+        if session.modified or not session.sid:
+            data = dict(session)
+            payload = json.dumps(data, separators=(",", ":"))
+            if not session.sid:
+                session.sid = secrets.token_urlsafe(32)
+            # Le compteur de version invalide le cache mémoire des autres workers
+            conn.execute(
+                "INSERT INTO sessions (sid, data, version, expires_at) VALUES (?, ?, 1, ?) "
+                "ON CONFLICT(sid) DO UPDATE SET data = excluded.data, version = sessions.version + 1, "
+                "expires_at = excluded.expires_at",
+                (session.sid, payload, expires_at)
+            )
+            version = conn.execute("SELECT version FROM sessions WHERE sid = ?", (session.sid,)).fetchone()[0]
+            self._cache_put(session.sid, version, data)
+        elif now + self.idle_timeout - getattr(session, "expires_at", 0) > self.touch_interval:
+            # Expiration glissante, sans écrire à chaque requête
+            conn.execute("UPDATE sessions SET expires_at = ? WHERE sid = ?", (expires_at, session.sid))
+        else:
+            return
+
+        response.set_cookie(
+            name,
+            session.sid,
+            max_age=self.idle_timeout,
+            httponly=self.get_cookie_httponly(app),
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+            domain=domain,
+            path=path,
+        )
+        self._purge_expired(conn, now)
+
+    def _purge_expired(self, conn, now):
+        if now - self._last_purge < 3600:
+            return
+        self._last_purge = now
+        try:
+            n = conn.execute("DELETE FROM sessions WHERE expires_at < ?", (now,)).rowcount
+            if n:
+                logger.info("Sessions expirées supprimées: %d", n)
+        except sqlite3.Error as e:
+            logger.warning("Erreur purge sessions: %s", e)
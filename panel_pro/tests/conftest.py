@@ -0,0 +1,22 @@
+import os
+import sys
+import importlib
+
+import pytest
+
+PANEL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def panel(tmp_path_factory):
+    """Module app.py importé sur des bases SQLite temporaires (panel, sessions, scores)."""
+    tmp = tmp_path_factory.mktemp("panel")
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("PANEL_API_TOKEN", "test")
+        mp.setenv("DATABASE_URL", f"sqlite:///{tmp / 'panel.db'}")
+        mp.setenv("SESSION_DB", str(tmp / "sessions.db"))
+        mp.setenv("SCORES_DB", str(tmp / "scores.db"))
+        mp.syspath_prepend(PANEL_DIR)
+        sys.modules.pop("app", None)
+        yield importlib.import_module("app")
+        sys.modules.pop("app", None)
@@ -0,0 +1,41 @@
+"""Auto-refresh de la liste admin : lignes sorties du filtre et suppressions signalées au client."""
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+
+ADMIN_ID = "222222222222222222"
+
+
+def test_delta_reports_rows_leaving_the_page(panel, monkeypatch):
+    monkeypatch.setattr(panel, "ADMIN_DISCORD_IDS", [ADMIN_ID])
+    app = panel.app
+    with Session(app.engine) as db:
+        bot = panel.BotType(key="homer", name="Homer")
+        guild = panel.Guild(discord_id="900000000000000001", name="Serveur", platform="discord")
+        db.add_all([bot, guild])
+        db.flush()
+        subs = [panel.Subscription(guild_id=guild.id, bot_type_id=bot.id, status="trial") for _ in range(3)]
+        db.add_all(subs)
+        db.commit()
+        guild_id, bot_id = guild.id, bot.id
+        deleted, moved, kept = (s.id for s in subs)
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["user"] = {"id": ADMIN_ID, "username": "admin"}
+    version = client.get("/admin/api/subs?status=trial").get_json()["version"]
+
+    # Même total qu'avant : une suppression + un ajout, et un statut qui sort du filtre
+    with Session(app.engine) as db:
+        db.get(panel.Subscription, moved).status = "canceled"
+        db.execute(delete(panel.Subscription).where(panel.Subscription.id == deleted))
+        added = panel.Subscription(guild_id=guild_id, bot_type_id=bot_id, status="trial")
+        db.add(added)
+        db.commit()
+        added = added.id
+
+    data = client.get("/admin/api/subs", query_string={
+        "status": "trial", "since": version, "ids": f"{kept},{moved},{deleted}",
+    }).get_json()
+    assert data["changed"]
+    assert data["removed"] == sorted([moved, deleted])
+    assert [row["id"] for row in data["rows"]] == [added]
@@ -0,0 +1,66 @@
+"""Cache des salons Discord : invalidation et pause après 429 partagées entre workers."""
+import pytest
+
+GUILD_ID = "933333333333333333"
+
+
+class FakeDiscord:
+    def __init__(self):
+        self.calls = 0
+        self.status_code = 200
+
+    def get(self, url, **kwargs):
+        self.calls += 1
+        return self
+
+    @property
+    def headers(self):
+        return {"Retry-After": "60"}
+
+    text = ""
+
+    def json(self):
+        if self.status_code == 429:
+            return {"retry_after": 60}
+        return [{"id": "1", "name": f"salon-{self.calls}", "type": 0}]
+
+
+@pytest.fixture
+def discord(panel, monkeypatch):
+    fake = FakeDiscord()
+    monkeypatch.setenv("DEADPOOL_TOKEN", "test")
+    monkeypatch.setattr(panel.requests, "get", fake.get)
+    return fake
+
+
+def worker_client(app):
+    app.config["WTF_CSRF_ENABLED"] = False
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["user"] = {"id": "1", "username": "test"}
+        sess["admin_guild_ids"] = [GUILD_ID]
+    return client
+
+
+def test_refresh_on_one_worker_invalidates_the_other(panel, discord):
+    first, second = worker_client(panel.make_app()), worker_client(panel.make_app())
+    url = f"/api/discord/channels/{GUILD_ID}"
+
+    assert first.get(url).headers["X-Cache"] == "miss"
+    assert first.get(url).headers["X-Cache"] == "hit"
+
+    assert second.post(f"{url}/refresh").status_code == 200
+    response = first.get(url)
+    assert response.headers["X-Cache"] == "miss"
+    assert response.get_json()[0]["name"] == "salon-2"
+
+
+def test_rate_limit_pauses_every_worker(panel, discord):
+    first, second = worker_client(panel.make_app()), worker_client(panel.make_app())
+    url = f"/api/discord/channels/{GUILD_ID}"
+    discord.status_code = 429
+
+    assert first.get(url).headers["X-Cache"] == "error"
+    assert discord.calls == 1
+    assert second.get(url).headers["X-Cache"] == "error"
+    assert discord.calls == 1
@@ -0,0 +1,67 @@
+"""Budget de requêtes SQL du dashboard : pas de N+1 quand le nombre de guildes grandit."""
+import datetime as dt
+import threading
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+USER_ID = "111111111111111111"
+
+
+@pytest.fixture(scope="module")
+def client(panel):
+    app = panel.app
+    app.config["WTF_CSRF_ENABLED"] = False
+
+    guild_ids = [str(900000000000000000 + i) for i in range(12)]
+    with Session(app.engine) as db:
+        bots = [panel.BotType(key=k, name=bd["name"]) for k, bd in panel.BOT_DEFS.items()]
+        guilds = [panel.Guild(discord_id=gid, name=f"Serveur {i}", platform="discord") for i, gid in enumerate(guild_ids)]
+        db.add_all(bots + guilds)
+        db.flush()
+        now = dt.datetime.utcnow()
+        for g in guilds:
+            for b in bots[:2]:
+                db.add(panel.Subscription(guild_id=g.id, bot_type_id=b.id, status="trial", trial_until=now + dt.timedelta(days=3)))
+        db.add(panel.TrialLock(discord_user_id=USER_ID, bot_key="homer", guild_discord_id=guild_ids[0], until=now + dt.timedelta(days=3)))
+        db.commit()
+
+    c = app.test_client()
+    with c.session_transaction() as sess:
+        sess["user"] = {"id": USER_ID, "username": "test"}
+        sess["admin_guild_ids"] = guild_ids
+    return c
+
+
+def count_statements(engine, fn):
+    """Requêtes SQL émises par ce thread pendant fn() (les threads de fond sont ignorés)."""
+    me = threading.get_ident()
+    count = 0
+
+    def on_execute(*args):
+        nonlocal count
+        if threading.get_ident() == me:
+            count += 1
+
+    event.listen(engine, "before_cursor_execute", on_execute)
+    try:
+        result = fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", on_execute)
+    return result, count
+
+
+def test_dashboard_statement_count(panel, client):
+    assert client.get("/dashboard").status_code == 200
+
+    response, count = count_statements(panel.app.engine, lambda: client.get("/dashboard"))
+
+    assert response.status_code == 200
+    assert b"Serveur 11" in response.data
+    assert count == panel.DASHBOARD_MAX_STATEMENTS
+
+
+def test_statements_header_is_opt_in(panel, client):
+    assert not panel.DB_STATEMENTS_HEADER
+    assert "X-DB-Statements" not in client.get("/dashboard").headers
@@ -0,0 +1,52 @@
+"""Cache de rendu des pages publiques : ETag stable, pas de session pour les visiteurs, purge multi-workers."""
+import sqlite3
+
+import pytest
+
+
+def session_rows(panel):
+    with sqlite3.connect(panel.SESSION_DB) as conn:
+        return conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+@pytest.mark.parametrize("path", ["/", "/pricing", "/faq", "/bots/homer"])
+def test_anonymous_views_create_no_session(panel, path):
+    client = panel.app.test_client()
+    before = session_rows(panel)
+    for _ in range(5):
+        response = client.get(path)
+        assert response.status_code == 200
+        assert "Set-Cookie" not in response.headers
+    assert session_rows(panel) == before
+
+
+def test_etag_is_shared_and_revalidates(panel):
+    first = panel.app.test_client().get("/pricing")
+    second = panel.app.test_client().get("/pricing")
+    assert first.headers["ETag"] == second.headers["ETag"]
+    assert b'name="csrf-token"' not in first.data
+
+    revalidated = panel.app.test_client().get("/pricing", headers={"If-None-Match": first.headers["ETag"]})
+    assert revalidated.status_code == 304
+
+
+def test_csrf_token_endpoint_opens_the_session(panel):
+    client = panel.app.test_client()
+    before = session_rows(panel)
+    response = client.get("/csrf-token")
+    assert response.status_code == 200
+    assert response.get_json()["csrf_token"]
+    assert session_rows(panel) == before + 1
+
+
+def test_purge_reaches_other_workers(panel, monkeypatch):
+    monkeypatch.setattr(panel, "PAGE_VERSION_CHECK_INTERVAL", 0)
+    other_worker = panel.make_app()
+    client = other_worker.test_client()
+    assert client.get("/pricing").status_code == 200
+
+    monkeypatch.setattr(panel, "TRIAL_DAYS", 42)
+    assert b"42 jours" not in client.get("/pricing").data
+
+    panel.app.invalidate_page_cache("test")
+    assert b"42 jours" in client.get("/pricing").data
@@ -0,0 +1,50 @@
+"""Sessions côté serveur : rotation du sid à la connexion."""
+import os
+import sys
+import sqlite3
+
+import pytest
+from flask import Flask, session
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from session_store import SQLiteSessionInterface  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.secret_key = "test"
+    app.session_interface = SQLiteSessionInterface(str(tmp_path / "sessions.db"))
+
+    @app.get("/visit")
+    def visit():
+        session["visited"] = True
+        return "ok"
+
+    @app.get("/login")
+    def login():
+        app.session_interface.regenerate(session)
+        session["user"] = {"id": "42"}
+        return "ok"
+
+    return app
+
+
+def sids(app):
+    with sqlite3.connect(app.session_interface.path) as conn:
+        return {row[0] for row in conn.execute("SELECT sid FROM sessions")}
+
+
+def test_login_rotates_sid_and_drops_old_row(app):
+    client = app.test_client()
+    client.get("/visit")
+    before = client.get_cookie("session").value
+    assert sids(app) == {before}
+
+    client.get("/login")
+    after = client.get_cookie("session").value
+
+    assert after != before
+    assert sids(app) == {after}
+    with client.session_transaction() as sess:
+        assert sess["visited"] and sess["user"] == {"id": "42"}
@@ -0,0 +1,25 @@
+"""Variantes d'images : seuls les fichiers hashés sont servis, avec un cache immuable."""
+import pytest
+
+VARIANT = "4_U_BOT-64w-d402381994.webp"
+
+
+@pytest.fixture
+def static_dir(panel, tmp_path, monkeypatch):
+    img = tmp_path / "img"
+    img.mkdir()
+    for name in (VARIANT, "manifest.json", ".build.lock", f"{VARIANT}.123.tmp"):
+        (img / name).write_bytes(b"x")
+    monkeypatch.setattr(panel.app, "static_folder", str(tmp_path))
+    return img
+
+
+def test_variant_is_immutable(panel, static_dir):
+    response = panel.app.test_client().get(f"/static/img/{VARIANT}")
+    assert response.status_code == 200
+    assert "immutable" in response.headers["Cache-Control"]
+
+
+@pytest.mark.parametrize("name", ["manifest.json", ".build.lock", f"{VARIANT}.123.tmp"])
+def test_build_files_are_not_served(panel, static_dir, name):
+    assert panel.app.test_client().get(f"/static/img/{name}").status_code == 404
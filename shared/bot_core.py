@@ -1,12 +1,15 @@
-import os, aiohttp, discord
+import os, time, aiohttp, discord
 from discord import app_commands
 from discord.ext import commands, tasks
 from dotenv import load_dotenv
 from openai import OpenAI
-from collections import deque 
+import asyncio
 
 # Import hybride
-from shared.fight_club import start_fight, register_vote, announce_result
+from shared.fight_club import start_fight, register_vote, announce_result, registry as fight_registry
+from shared.memory import ChannelMemory
+from shared.semantic_cache import SemanticCache, NUMPY_AVAILABLE
+from shared.send_queue import send_queue
 
 load_dotenv()
 
@@ -28,10 +31,19 @@ class UltimateBot(commands.Bot):
         self.openai_model = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
         
         self.allowed_guilds = set()
-        self.conversation_history = {}
+        self.memory = ChannelMemory(bot_key)
+
+        # Cache sémantique des réponses (opt-in par persona : SEMANTIC_CACHE_HOMER=1)
+        self.reply_cache = None
+        if os.getenv(f"SEMANTIC_CACHE_{bot_key.upper()}") == "1":
+            if NUMPY_AVAILABLE:
+                self.reply_cache = SemanticCache()
+            else:
+                print(f"[{bot_key}] numpy absent : cache sémantique désactivé.")
 
     async def setup_hook(self):
         self.refresh_allowed_guilds.start()
+        fight_registry.attach(self)
         print(f"[{self.bot_key.capitalize()}] Moteur Slash démarré (MODE SERVEUR UNIQUEMENT).")
 
     @tasks.loop(seconds=60)
@@ -75,19 +87,34 @@ class UltimateBot(commands.Bot):
 
     # --- IA & MÉMOIRE ---
     async def get_gpt_reply(self, channel_id, user_msg):
-        if channel_id not in self.conversation_history:
-            self.conversation_history[channel_id] = deque(maxlen=6)
-        
-        history = self.conversation_history[channel_id]
-        history.append({"role": "user", "content": user_msg})
-        messages_payload = [{"role": "system", "content": self.system_prompt}] + list(history)
+        if self.reply_cache:
+            cached = self.reply_cache.lookup(user_msg)
+            if cached:
+                self.memory.append(
+                    channel_id,
+                    {"role": "user", "content": user_msg},
+                    {"role": "assistant", "content": cached}
+                )
+                return cached
+
+        # Résumé glissant + derniers échanges : taille de prompt bornée (construit seulement sur un miss)
+        messages_payload = self.memory.build_messages(channel_id, self.system_prompt, user_msg)
 
         try:
-            response = self.openai_client.chat.completions.create(
+            started = time.monotonic()
+            response = await asyncio.to_thread(
+                self.openai_client.chat.completions.create,
                 model=self.openai_model, messages=messages_payload, temperature=0.8, max_tokens=250
             )
             bot_reply = response.choices[0].message.content.strip()
-            history.append({"role": "assistant", "content": bot_reply})
+            if self.reply_cache:
+                self.reply_cache.store(user_msg, bot_reply, latency=time.monotonic() - started)
+            self.memory.append(
+                channel_id,
+                {"role": "user", "content": user_msg},
+                {"role": "assistant", "content": bot_reply}
+            )
+            self.memory.maybe_compact(channel_id, self.openai_client, self.openai_model)
             return bot_reply
         except Exception as e:
             print(f"Erreur GPT: {e}")
@@ -99,7 +126,7 @@ class UltimateBot(commands.Bot):
 
         # --- BLOCAGE DES DMs (Chatbot) ---
         if isinstance(message.channel, discord.DMChannel):
-            await message.channel.send("❌ Je ne discute pas en privé. Ajoute-moi sur un serveur !")
+            send_queue.send(message.channel, "❌ Je ne discute pas en privé. Ajoute-moi sur un serveur !")
             return
         # ---------------------------------
 
@@ -109,13 +136,13 @@ class UltimateBot(commands.Bot):
         if is_mentioned:
             # Vérif abonnement serveur
             if not await self.is_allowed(message.guild.id):
-                await message.channel.send(f"⛔ Pas d'abonnement actif.")
+                send_queue.send(message.channel, f"⛔ Pas d'abonnement actif.")
                 return
             
             clean_text = message.content.replace(f"<@{self.user.id}>", "").strip() or "Salut !"
             async with message.channel.typing():
                 reply = await self.get_gpt_reply(message.channel.id, clean_text)
-                await message.channel.send(reply)
+                send_queue.send(message.channel, reply)
 
     def register_common_commands(self):
         
@@ -140,6 +167,23 @@ class UltimateBot(commands.Bot):
             await self.refresh_allowed_guilds()
             await ctx.reply("✅ Sync Panel forcée.")
 
+        @self.command(name="cache_stats")
+        async def _cache_stats(ctx):
+            if not self.reply_cache: return await ctx.reply("Cache sémantique désactivé.")
+            st = self.reply_cache.stats()
+            await ctx.reply(
+                f"🧠 Cache : {st['entries']} entrées | {st['hits']} hits / {st['misses']} miss "
+                f"({st['hit_rate']:.0%}) | ~{st['saved_seconds']}s d'IA économisées"
+            )
+
+        @self.command(name="queue_stats")
+        async def _queue_stats(ctx):
+            st = send_queue.stats()
+            await ctx.reply(
+                f"📬 File d'envoi : {st['queued']} en attente | {st['sent']} envoyés "
+                f"({st['coalesced']} fusionnés) | {st['rate_limited']} × 429"
+            )
+
         # === SLASH COMMANDS ===
         
         @self.tree.command(name="duel", description="Lancer un duel")
@@ -10,10 +10,11 @@ from discord.ext import tasks
 from shared.bot_core import UltimateBot
 
 # --- IMPORTS DES FONCTIONNALITÉS ---
-from shared.debate import run_debate 
+from shared.debate import run_debate, cancel_debate
 from shared.quiz import start_quiz, check_answer, get_top_scores
-from shared.recap import generate_recap
+from shared.recap import generate_recap, record_message
 from shared.clash import clash_user 
+from shared.send_queue import send_queue
 
 # --- CONFIGURATION API ---
 PANEL_API_URL = "http://bots-panel:5000/api/bot/tasks" 
@@ -115,9 +116,12 @@ class BotWithFeatures(UltimateBot):
     # --- ÉCOUTE DES MESSAGES ---
     async def on_message(self, message):
         if message.author.bot: return
+
+        # Buffer du /recap
+        record_message(message)
         
         # Quiz
-        is_quiz_resp = await check_answer(message, self.openai_client, self.persona_name)
+        is_quiz_resp = await check_answer(message, self.openai_client, self.persona_name, self.bot_key)
         if is_quiz_resp: return 
 
         await super().on_message(message)
@@ -148,7 +152,7 @@ class BotWithFeatures(UltimateBot):
                     embed = discord.Embed(title=news['title'], url=news['link'], color=0x5865F2)
                     embed.set_image(url=news['image'])
                     embed.set_footer(text=f"{self.persona_name} News | {cat.upper()}")
-                    await channel.send(f"🎙️ **{intro}**", embed=embed)
+                    send_queue.send(channel, f"🎙️ **{intro}**", embed=embed)
             elif feature_type == 'meteo':
                 city = param if param else 'Paris'
                 weather = get_real_weather(city)
@@ -158,7 +162,7 @@ class BotWithFeatures(UltimateBot):
                     embed = discord.Embed(title=f"☁️ Météo : {weather['city']}", color=0xFFA500)
                     embed.add_field(name="🌡️ Temp", value=f"**{weather['temp']}°C**", inline=True)
                     embed.add_field(name="👀 Ciel", value=f"{weather['desc'].capitalize()}", inline=True)
-                    await channel.send(f"🎙️ **{intro}**", embed=embed)
+                    send_queue.send(channel, f"🎙️ **{intro}**", embed=embed)
             elif feature_type == 'meme':
                 meme = get_random_meme()
                 if meme:
@@ -166,7 +170,7 @@ class BotWithFeatures(UltimateBot):
                     embed = discord.Embed(title=meme['title'], color=0xFF4500)
                     embed.set_image(url=meme['image'])
                     embed.set_footer(text=f"Via r/{meme['subreddit']}")
-                    await channel.send(f"😂 **{intro}**", embed=embed)
+                    send_queue.send(channel, f"😂 **{intro}**", embed=embed)
         except Exception as e: print(f"Erreur d'envoi : {e}")
 
     # --- COMMANDES SLASH ---
@@ -203,6 +207,14 @@ class BotWithFeatures(UltimateBot):
                 await interaction.response.defer()
                 await run_debate(interaction, self.openai_client, self.openai_model, sujet, bot1.value, bot2.value)
 
+        @self.tree.command(name="stop_debat", description="Arrêter le débat en cours dans ce salon")
+        async def slash_stop_debat(interaction: discord.Interaction):
+            if await self.check_access(interaction):
+                if cancel_debate(interaction.channel_id):
+                    await interaction.response.send_message("🛑 Débat arrêté.", ephemeral=True)
+                else:
+                    await interaction.response.send_message("Aucun débat en cours ici.", ephemeral=True)
+
         @self.tree.command(name="quiz", description="Lancer un quiz de culture générale")
         async def slash_quiz(interaction: discord.Interaction):
             if await self.check_access(interaction):
@@ -211,24 +223,46 @@ class BotWithFeatures(UltimateBot):
 
         # --- MODIFICATION ICI : AJOUT DU LIEN VERS LE PANEL ---
         @self.tree.command(name="classement", description="Voir le top des joueurs du Quiz")
-        async def slash_classement(interaction: discord.Interaction):
+        @app_commands.describe(periode="Fenêtre de temps", portee="Ce serveur ou tous les serveurs")
+        @app_commands.choices(periode=[
+            app_commands.Choice(name="Depuis toujours", value="all"),
+            app_commands.Choice(name="Cette semaine", value="week"),
+            app_commands.Choice(name="Aujourd'hui", value="day"),
+        ], portee=[
+            app_commands.Choice(name="Ce serveur", value="serveur"),
+            app_commands.Choice(name="Global", value="global"),
+        ])
+        async def slash_classement(interaction: discord.Interaction, periode: str = "all", portee: str = "global"):
             if await self.check_access(interaction):
-                top = get_top_scores()
-                txt = "**🏆 CLASSEMENT QUIZ (TOP 5)**\n"
+                guild_id = interaction.guild_id if portee == "serveur" else None
+                top = await asyncio.to_thread(get_top_scores, 5, guild_id, None, periode)
+                labels = {"all": "", "week": " — SEMAINE", "day": " — AUJOURD'HUI"}
+                scope = " (SERVEUR)" if guild_id else ""
+                txt = f"**🏆 CLASSEMENT QUIZ (TOP 5){labels.get(periode, '')}{scope}**\n"
                 for i, (uid, score) in enumerate(top, 1):
                     txt += f"{i}. <@{uid}> : **{score} pts**\n"
                 if not top: txt += "Aucun score pour l'instant."
                 
                 # Le lien magique qui redirige vers ton panel
-                txt += "\n🔗 **Voir tout le classement :** https://panel.4ubot.fr/leaderboard"
+                link = f"https://panel.4ubot.fr/leaderboard?window={periode}"
+                if guild_id:
+                    link += f"&guild={guild_id}"
+                txt += f"\n🔗 **Voir tout le classement :** {link}"
                 
                 await interaction.response.send_message(txt)
 
         @self.tree.command(name="recap", description="Génère un Flash Info des dernières discussions")
-        async def slash_recap(interaction: discord.Interaction):
+        @app_commands.describe(periode="Fenêtre à résumer (par défaut : derniers messages)")
+        @app_commands.choices(periode=[
+            app_commands.Choice(name="Derniers messages", value="recent"),
+            app_commands.Choice(name="Dernière heure", value="1h"),
+            app_commands.Choice(name="6 dernières heures", value="6h"),
+            app_commands.Choice(name="Aujourd'hui", value="jour"),
+        ])
+        async def slash_recap(interaction: discord.Interaction, periode: str = "recent"):
             if await self.check_access(interaction):
                 await interaction.response.defer()
-                await generate_recap(interaction, self.openai_client, self.persona_name)
+                await generate_recap(interaction, self.openai_client, self.persona_name, periode=periode)
 
         @self.tree.command(name="clash", description="Clash un membre du serveur")
         async def slash_clash(interaction: discord.Interaction, victime: discord.User):
@@ -2,6 +2,14 @@ import asyncio
 import discord
 import re
 from openai import OpenAI
+from shared.send_queue import send_queue
+
+# Rythme : délai minimum entre deux répliques affichées (effet "en train d'écrire")
+MIN_TURN_INTERVAL = 4
+MAX_DEBATES_PER_GUILD = 2
+
+# channel_id -> {"guild_id": int, "task": asyncio.Task | None (slot réservé, pas encore lancé)}
+active_debates = {}
 
 # Personas avec instructions renforcées
 PERSONAS = {
@@ -33,7 +41,9 @@ async def generate_reply(client: OpenAI, model_name, system_prompt, history, con
     messages.append({"role": "user", "content": context_instruction})
     
     try:
-        response = client.chat.completions.create(
+        # Appel bloquant déporté dans un thread : la boucle continue d'afficher pendant ce temps
+        response = await asyncio.to_thread(
+            client.chat.completions.create,
             model=model_name,
             messages=messages,
             temperature=0.9,
@@ -53,6 +63,71 @@ async def generate_reply(client: OpenAI, model_name, system_prompt, history, con
         print(f"Erreur OpenAI Debate: {e}")
         return "Grmmbll... (Bug cerveau)"
 
+def build_instruction(topic, round_index, rounds, speaker, opponent, last_reply):
+    """Consigne du tour : dépend uniquement de la réplique précédente."""
+    is_last_round = (round_index == rounds - 1)
+    if last_reply is None:
+        return f"Le débat commence sur : '{topic}'. Donne ton avis tranché. Sois court et percutant. Ne mets pas ton nom au début."
+    if speaker["side"] == 0:
+        if is_last_round:
+            return f"{opponent['name']} a dit : \"{last_reply}\". C'est ta dernière chance ! Lance une punchline finale pour clore le débat. Ne mets pas ton nom au début."
+        return f"{opponent['name']} a dit : \"{last_reply}\". Contredis-le avec un nouvel argument absurde ou une attaque personnelle. Ne répète pas ce que tu as déjà dit."
+    if is_last_round:
+        return f"{opponent['name']} vient de conclure par : \"{last_reply}\". Avoir le dernier mot, tu dois ! Finis ce débat avec une phrase culte ou une insulte finale. Ne mets pas ton nom au début."
+    return f"{opponent['name']} a dit : \"{last_reply}\". Réponds-lui sur le sujet '{topic}'. Il a tort ! Trouve un angle d'attaque différent."
+
+async def _debate_engine(channel, client: OpenAI, model_name, topic, b1, b2, rounds):
+    """Pipeline : la réplique suivante est générée pendant que la courante s'affiche."""
+    speakers = [dict(b1, side=0), dict(b2, side=1)]
+    turns = [(i, side) for i in range(rounds) for side in (0, 1)]
+    loop = asyncio.get_running_loop()
+    shared_history = []
+
+    def launch(k, last_reply):
+        round_index, side = turns[k]
+        speaker, opponent = speakers[side], speakers[1 - side]
+        instruction = build_instruction(topic, round_index, rounds, speaker, opponent, last_reply)
+        return asyncio.create_task(
+            generate_reply(client, model_name, speaker['prompt'], list(shared_history), instruction, speaker['name'])
+        )
+
+    next_task = launch(0, None)
+    last_sent = loop.time()
+    try:
+        for k, (_, side) in enumerate(turns):
+            speaker = speakers[side]
+            async with channel.typing():
+                reply = await next_task
+                shared_history.append({"role": "assistant", "content": f"{speaker['name']}: {reply}"})
+                next_task = launch(k + 1, shared_history[-1]['content']) if k + 1 < len(turns) else None
+
+                # Le "typing" ne sert plus qu'à garantir un intervalle minimum d'affichage
+                wait = MIN_TURN_INTERVAL - (loop.time() - last_sent)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+
+            embed = discord.Embed(description=reply, color=speaker['color'])
+            embed.set_author(name=speaker['name'])
+            await send_queue.send(channel, embed=embed)
+            last_sent = loop.time()
+    finally:
+        if next_task and not next_task.done():
+            next_task.cancel()
+
+    send_queue.send(channel, "🏁 **Fin du débat !** Qui a gagné ? Réagissez !")
+
+def cancel_debate(channel_id):
+    """Interrompt le débat en cours dans ce salon. Renvoie True si un débat a été arrêté."""
+    entry = active_debates.get(channel_id)
+    if not entry or (entry["task"] is not None and entry["task"].done()):
+        return False
+    # Marqueur lu par run_debate : distingue /stop d'une annulation de run_debate elle-même
+    entry["cancelled"] = True
+    if entry["task"] is not None:
+        entry["task"].cancel()
+    # Sinon slot réservé, annonce en cours d'envoi : le moteur ne sera pas lancé
+    return True
+
 async def run_debate(interaction: discord.Interaction, client: OpenAI, model_name: str, topic: str, bot1_key: str, bot2_key: str, rounds: int = 3):
     b1 = PERSONAS.get(bot1_key)
     b2 = PERSONAS.get(bot2_key)
@@ -61,53 +136,42 @@ async def run_debate(interaction: discord.Interaction, client: OpenAI, model_nam
         await interaction.followup.send("❌ Bots invalides.")
         return
 
-    # Annonce
-    embed_intro = discord.Embed(title="🥊 CLASH DE TITANS", description=f"Sujet : **{topic}**", color=0x99AAB5)
-    embed_intro.add_field(name="Coin Gauche", value=b1['name'], inline=True)
-    embed_intro.add_field(name="Coin Droit", value=b2['name'], inline=True)
-    await interaction.followup.send(embed=embed_intro)
+    channel = interaction.channel
+    guild_id = interaction.guild_id
+    if channel.id in active_debates:
+        await interaction.followup.send("❌ Un débat est déjà en cours dans ce salon.")
+        return
+    if sum(1 for d in active_debates.values() if d["guild_id"] == guild_id) >= MAX_DEBATES_PER_GUILD:
+        await interaction.followup.send(f"❌ Maximum {MAX_DEBATES_PER_GUILD} débats en même temps sur ce serveur.")
+        return
 
-    shared_history = [] 
-    
-    for i in range(rounds):
-        is_last_round = (i == rounds - 1)
-        
-        # --- TOUR DU BOT 1 ---
-        async with interaction.channel.typing():
-            await asyncio.sleep(4)
-            
-            if i == 0:
-                instruction = f"Le débat commence sur : '{topic}'. Donne ton avis tranché. Sois court et percutant. Ne mets pas ton nom au début."
-            elif is_last_round:
-                last_reply = shared_history[-1]['content']
-                instruction = f"{b2['name']} a dit : \"{last_reply}\". C'est ta dernière chance ! Lance une punchline finale pour clore le débat. Ne mets pas ton nom au début."
-            else:
-                last_reply = shared_history[-1]['content']
-                instruction = f"{b2['name']} a dit : \"{last_reply}\". Contredis-le avec un nouvel argument absurde ou une attaque personnelle. Ne répète pas ce que tu as déjà dit."
-
-            reply = await generate_reply(client, model_name, b1['prompt'], shared_history, instruction, b1['name'])
-            
-            embed = discord.Embed(description=reply, color=b1['color'])
-            embed.set_author(name=b1['name'])
-            await interaction.channel.send(embed=embed)
-            shared_history.append({"role": "assistant", "content": f"{b1['name']}: {reply}"})
-
-        # --- TOUR DU BOT 2 ---
-        async with interaction.channel.typing():
-            await asyncio.sleep(4)
-            
-            last_reply = shared_history[-1]['content']
-            
-            if is_last_round:
-                instruction = f"{b1['name']} vient de conclure par : \"{last_reply}\". Avoir le dernier mot, tu dois ! Finis ce débat avec une phrase culte ou une insulte finale. Ne mets pas ton nom au début."
-            else:
-                instruction = f"{b1['name']} a dit : \"{last_reply}\". Réponds-lui sur le sujet '{topic}'. Il a tort ! Trouve un angle d'attaque différent."
-            
-            reply = await generate_reply(client, model_name, b2['prompt'], shared_history, instruction, b2['name'])
-            
-            embed = discord.Embed(description=reply, color=b2['color'])
-            embed.set_author(name=b2['name'])
-            await interaction.channel.send(embed=embed)
-            shared_history.append({"role": "assistant", "content": f"{b2['name']}: {reply}"})
-
-    await interaction.channel.send(f"🏁 **Fin du débat !** Qui a gagné ? Réagissez !")
\ No newline at end of file
+    # Réservation immédiate (avant tout await) : deux /debat simultanés ne
+    # peuvent pas passer les vérifications ci-dessus tous les deux
+    entry = {"guild_id": guild_id, "task": None}
+    active_debates[channel.id] = entry
+    task = None
+    try:
+        # Annonce
+        embed_intro = discord.Embed(title="🥊 CLASH DE TITANS", description=f"Sujet : **{topic}**", color=0x99AAB5)
+        embed_intro.add_field(name="Coin Gauche", value=b1['name'], inline=True)
+        embed_intro.add_field(name="Coin Droit", value=b2['name'], inline=True)
+        await send_queue.followup(interaction, embed=embed_intro)
+
+        if entry.get("cancelled"):
+            send_queue.send(channel, "🛑 **Débat interrompu !**")
+            return
+
+        task = asyncio.create_task(_debate_engine(channel, client, model_name, topic, b1, b2, rounds))
+        entry["task"] = task
+        await task
+    except asyncio.CancelledError:
+        if task:
+            task.cancel()
+        if not entry.get("cancelled"):
+            # Arrêt du bot / interaction détruite : on propage l'annulation
+            raise
+        send_queue.send(channel, "🛑 **Débat interrompu !**")
+    except Exception as e:
+        print(f"Erreur Debate: {e}")
+    finally:
+        active_debates.pop(channel.id, None)
@@ -1,20 +1,22 @@
 from openai import OpenAI
 import os
+import json
 import time
 import asyncio
 import discord
 from dotenv import load_dotenv
+from shared.send_queue import send_queue
 
 load_dotenv()
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-fights = {}
-results = {}
+FIGHT_DURATION = 60  # secondes
+STATE_DIR = "shared"
 
 # Petit utilitaire pour répondre aux Slash Commands
 async def smart_reply(interaction, text):
     # On utilise toujours followup car on fera un "defer" avant
-    await interaction.followup.send(text)
+    await send_queue.followup(interaction, text)
 
 def generate_fight_prompt():
     prompt = (
@@ -32,22 +34,168 @@ def generate_fight_prompt():
         print(f"Erreur génération combat : {e}")
         return "Batman VS Iron Man"
 
+def generate_result_text(fight_text, winner):
+    try:
+        prompt = (
+            f"Raconte la fin d'un combat entre {fight_text}. "
+            f"Le gagnant est **{winner.title()}**. "
+            f"Fais un récit court (3 phrases max), drôle et épique."
+        )
+        response = client.chat.completions.create(
+            model="gpt-3.5-turbo",
+            messages=[{"role": "user", "content": prompt}]
+        )
+        return response.choices[0].message.content.strip()
+    except Exception:
+        return f"Le gagnant est **{winner.title()}** !"
+
+
+class FightRegistry:
+    """Combats en cours d'un bot : une seule tâche minuterie pour toutes les
+    échéances, état sauvegardé sur disque pour survivre à un redémarrage.
+
+    Chaque bot a son propre fichier (fights_<bot_key>.json) : plusieurs bots
+    dans le même salon ne se marchent donc jamais dessus."""
+
+    def __init__(self):
+        self.bot = None
+        self.path = None
+        # channel_id -> {"fight": str, "combatants": [str, str], "votes": {voter_id: index}, "deadline": float}
+        self.fights = {}
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def attach(self, bot):
+        """À appeler depuis setup_hook : charge l'état et lance la minuterie."""
+        self.bot = bot
+        self.path = os.path.join(STATE_DIR, f"fights_{bot.bot_key}.json")
+        self._load()
+        if self._task is None:
+            self._task = asyncio.create_task(self._timer_loop())
+
+    # --- PERSISTANCE ---
+    def _load(self):
+        if not os.path.exists(self.path): return
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            self.fights = {int(cid): fight for cid, fight in data.items()}
+            if self.fights:
+                print(f"⚔️ {len(self.fights)} combat(s) restauré(s) depuis {self.path}")
+        except Exception as e:
+            print(f"Erreur chargement combats : {e}")
+
+    def _save(self):
+        if not self.path: return
+        try:
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump({str(cid): fight for cid, fight in self.fights.items()}, f)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            print(f"Erreur sauvegarde combats : {e}")
+
+    # --- CYCLE DE VIE ---
+    def add(self, channel_id, fight_text, duration=FIGHT_DURATION):
+        if channel_id in self.fights:
+            return False
+        self.fights[channel_id] = {
+            "fight": fight_text,
+            "combatants": [c.strip() for c in fight_text.lower().split(" vs ")],
+            "votes": {},
+            "deadline": time.time() + duration
+        }
+        self._save()
+        self._wakeup.set()
+        return True
+
+    def vote(self, channel_id, voter_id, vote):
+        fight = self.fights.get(channel_id)
+        if not fight:
+            return "Aucun combat en cours ici."
+
+        vote_cleaned = vote.strip().lower()
+        index = None
+        for i, c in enumerate(fight["combatants"]):
+            if vote_cleaned in c or c in vote_cleaned:
+                index = i
+                break
+
+        if index is None:
+            return f"Choix invalide. Le combat est : **{fight['fight']}**"
+
+        fight["votes"][str(voter_id)] = index
+        self._save()
+        return f"✅ Vote enregistré pour **{fight['combatants'][index].title()}** !"
+
+    async def _timer_loop(self):
+        await self.bot.wait_until_ready()
+        while True:
+            self._wakeup.clear()
+            try:
+                now = time.time()
+                for channel_id in [cid for cid, f in self.fights.items() if f["deadline"] <= now]:
+                    await self.announce(channel_id)
+            except Exception as e:
+                print(f"Erreur minuterie combats : {e}")
+
+            timeout = None
+            if self.fights:
+                timeout = max(0, min(f["deadline"] for f in self.fights.values()) - time.time())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def announce(self, channel_id):
+        # On retire le combat AVANT d'appeler l'IA : pas de double annonce possible
+        fight = self.fights.pop(channel_id, None)
+        if not fight: return
+        self._save()
+
+        channel = self.bot.get_channel(channel_id)
+        if channel is None:
+            try:
+                channel = await self.bot.fetch_channel(channel_id)
+            except discord.HTTPException as e:
+                print(f"Salon {channel_id} introuvable pour le combat : {e}")
+                return
+
+        votes = fight["votes"]
+        if not votes:
+            send_queue.send(channel, "Aucun vote... Combat annulé par manque d'intérêt. 😒")
+            return
+
+        count = {}
+        for index in votes.values():
+            count[index] = count.get(index, 0) + 1
+
+        max_votes = max(count.values())
+        winners = [index for index, v in count.items() if v == max_votes]
+
+        if len(winners) > 1:
+            send_queue.send(channel, f"🤷 Égalité parfaite ! Pas de vainqueur aujourd'hui.")
+            return
+
+        winner = fight["combatants"][winners[0]]
+        result_text = await asyncio.to_thread(generate_result_text, fight["fight"], winner)
+        send_queue.send(channel, f"🏆 **RÉSULTAT** 🏆\n{result_text}")
+
+
+registry = FightRegistry()
+
 async def start_fight(interaction, custom_fight=None):
-    channel = interaction.channel
-    channel_id = channel.id
-    
-    if channel_id in fights:
+    channel_id = interaction.channel.id
+
+    if channel_id in registry.fights:
         await smart_reply(interaction, "Un combat est déjà en cours dans ce salon. Patiente.")
         return
 
-    fight_text = custom_fight if custom_fight else generate_fight_prompt()
-    
-    fights[channel_id] = {
-        "fight": fight_text,
-        "votes": {},
-        "start_time": time.time(),
-        "channel": channel
-    }
+    fight_text = custom_fight if custom_fight else await asyncio.to_thread(generate_fight_prompt)
+
+    if not registry.add(channel_id, fight_text):
+        await smart_reply(interaction, "Un combat est déjà en cours dans ce salon. Patiente.")
+        return
 
     # --- CHANGEMENT ICI : On ne parle plus que de /vote ---
     txt_annonce = (
@@ -55,75 +203,14 @@ async def start_fight(interaction, custom_fight=None):
         f"**{fight_text}**\n"
         f"👇 Pour voter, utilisez la commande :\n"
         f"### `/vote choix:<nom>`\n"
-        f"⏳ Résultat dans 60 secondes..."
+        f"⏳ Résultat dans {FIGHT_DURATION} secondes..."
     )
     
+    # Pas d'attente ici : la minuterie du registre annoncera le résultat
     await smart_reply(interaction, txt_annonce)
-    
-    await asyncio.sleep(60)
-    await announce_result(channel_id)
 
 def register_vote(channel_id, voter, vote):
-    if channel_id not in fights:
-        return "Aucun combat en cours ici."
-
-    fight = fights[channel_id]
-    combatants = fight["fight"].lower().split(" vs ")
-    vote_cleaned = vote.strip().lower()
-
-    valid = False
-    for c in combatants:
-        if vote_cleaned in c or c in vote_cleaned:
-            valid = True
-            vote_cleaned = c 
-            break
-            
-    if not valid:
-        return f"Choix invalide. Le combat est : **{fight['fight']}**"
-
-    fight["votes"][voter.id] = vote_cleaned
-    return f"✅ Vote enregistré pour **{vote_cleaned.title()}** !"
+    return registry.vote(channel_id, voter.id, vote)
 
 async def announce_result(channel_id):
-    if channel_id not in fights: return
-
-    fight = fights[channel_id]
-    channel = fight["channel"]
-    votes = fight["votes"]
-
-    if not votes:
-        await channel.send("Aucun vote... Combat annulé par manque d'intérêt. 😒")
-        del fights[channel_id]
-        return
-
-    count = {}
-    for v in votes.values():
-        count[v] = count.get(v, 0) + 1
-
-    max_votes = max(count.values())
-    winners = [name for name, v in count.items() if v == max_votes]
-    fight_text = fight['fight']
-
-    if len(winners) > 1:
-        await channel.send(f"🤷 Égalité parfaite ! Pas de vainqueur aujourd'hui.")
-        del fights[channel_id]
-        return
-
-    winner = winners[0]
-    
-    try:
-        prompt = (
-            f"Raconte la fin d'un combat entre {fight_text}. "
-            f"Le gagnant est **{winner.title()}**. "
-            f"Fais un récit court (3 phrases max), drôle et épique."
-        )
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}]
-        )
-        result_text = response.choices[0].message.content.strip()
-    except Exception:
-        result_text = f"Le gagnant est **{winner.title()}** !"
-
-    await channel.send(f"🏆 **RÉSULTAT** 🏆\n{result_text}")
-    del fights[channel_id]
\ No newline at end of file
+    await registry.announce(channel_id)
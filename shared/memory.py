@@ -0,0 +1,122 @@
+import os
+import time
+import sqlite3
+import asyncio
+from openai import OpenAI
+
+# Mémoire longue du chatbot : résumé glissant + derniers échanges bruts, par salon
+STATE_DIR = "shared"
+RAW_TOKEN_BUDGET = 600    # au-delà, les plus vieux échanges partent dans le résumé
+KEEP_RAW_TURNS = 4        # toujours gardés tels quels
+MAX_RAW_TURNS = 16        # garde-fou si la compaction échoue
+SUMMARY_MAX_TOKENS = 250
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS channel_summary (
+    channel_id INTEGER PRIMARY KEY,
+    summary TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS channel_turns (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel_id INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    tokens INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_channel_turns_channel ON channel_turns (channel_id, id);
+"""
+
+
+def estimate_tokens(text):
+    # ~4 caractères par token, suffisant pour un budget
+    return len(text) // 4 + 1
+
+
+class ChannelMemory:
+    def __init__(self, bot_key, path=None):
+        self.path = path or os.path.join(STATE_DIR, f"memory_{bot_key}.db")
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        self._compacting = set()
+        # Références fortes : la boucle ne garde qu'une référence faible aux tâches
+        self._tasks = set()
+
+    def load(self, channel_id):
+        """Renvoie (résumé, [messages bruts]) prêts à injecter dans le prompt."""
+        row = self.db.execute("SELECT summary FROM channel_summary WHERE channel_id = ?", (channel_id,)).fetchone()
+        rows = self.db.execute(
+            "SELECT role, content FROM channel_turns WHERE channel_id = ? ORDER BY id DESC LIMIT ?",
+            (channel_id, MAX_RAW_TURNS)
+        ).fetchall()
+        turns = [{"role": role, "content": content} for role, content in reversed(rows)]
+        return (row[0] if row else None), turns
+
+    def build_messages(self, channel_id, system_prompt, user_msg):
+        summary, turns = self.load(channel_id)
+        messages = [{"role": "system", "content": system_prompt}]
+        if summary:
+            messages.append({"role": "system", "content": f"Résumé de la conversation jusqu'ici : {summary}"})
+        return messages + turns + [{"role": "user", "content": user_msg}]
+
+    def append(self, channel_id, *turns):
+        now = time.time()
+        with self.db:
+            self.db.executemany(
+                "INSERT INTO channel_turns (channel_id, role, content, tokens, created_at) VALUES (?, ?, ?, ?, ?)",
+                [(channel_id, t["role"], t["content"], estimate_tokens(t["content"]), now) for t in turns]
+            )
+
+    def maybe_compact(self, channel_id, client: OpenAI, model):
+        """Lance la compaction en tâche de fond si les échanges bruts dépassent le budget."""
+        if channel_id in self._compacting:
+            return
+        count, tokens = self.db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(tokens), 0) FROM channel_turns WHERE channel_id = ?", (channel_id,)
+        ).fetchone()
+        if count <= KEEP_RAW_TURNS or tokens <= RAW_TOKEN_BUDGET:
+            return
+        self._compacting.add(channel_id)
+        task = asyncio.create_task(self._compact(channel_id, client, model))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _compact(self, channel_id, client: OpenAI, model):
+        try:
+            summary, _ = self.load(channel_id)
+            rows = self.db.execute(
+                "SELECT id, role, content FROM channel_turns WHERE channel_id = ? ORDER BY id", (channel_id,)
+            ).fetchall()
+            old = rows[:-KEEP_RAW_TURNS]
+            if not old:
+                return
+
+            transcript = "\n".join(f"{'Utilisateur' if role == 'user' else 'Bot'}: {content}" for _, role, content in old)
+            prompt = (
+                f"Résumé actuel : {summary or '(vide)'}\n\n"
+                f"Nouveaux échanges :\n{transcript}\n\n"
+                "Mets à jour le résumé en intégrant les nouveaux échanges. Garde les faits utiles "
+                "(prénoms, sujets, préférences, blagues récurrentes). 120 mots maximum, en français."
+            )
+            response = await asyncio.to_thread(
+                client.chat.completions.create,
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.3,
+                max_tokens=SUMMARY_MAX_TOKENS
+            )
+            new_summary = response.choices[0].message.content.strip()
+
+            with self.db:
+                self.db.execute(
+                    "INSERT INTO channel_summary (channel_id, summary, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(channel_id) DO UPDATE SET summary = excluded.summary, updated_at = excluded.updated_at",
+                    (channel_id, new_summary, time.time())
+                )
+                self.db.execute("DELETE FROM channel_turns WHERE channel_id = ? AND id <= ?", (channel_id, old[-1][0]))
+        except Exception as e:
+            print(f"Erreur compaction mémoire {channel_id}: {e}")
+        finally:
+            self._compacting.discard(channel_id)
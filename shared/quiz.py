@@ -1,14 +1,11 @@
-import os
-import json
 import asyncio
 import re
 import traceback
 import discord
 import random
 from openai import OpenAI
-
-# Fichier de sauvegarde des scores
-SCORE_FILE = "shared/leaderboard.json"
+from shared.send_queue import send_queue
+from shared.scores import add_points, top_scores, leaderboard_page
 
 # Liste de thèmes
 THEMES = [
@@ -20,23 +17,15 @@ THEMES = [
 
 DIFFICULTES = ["Facile", "Moyenne", "Difficile", "Expert", "Absurde"]
 
-def load_scores():
-    if not os.path.exists(SCORE_FILE): return {}
-    try:
-        with open(SCORE_FILE, "r") as f: return json.load(f)
-    except: return {}
-
-def save_score(user_id, points=1):
-    scores = load_scores()
-    uid = str(user_id)
-    scores[uid] = scores.get(uid, 0) + points
-    with open(SCORE_FILE, "w") as f: json.dump(scores, f)
-    return scores[uid]
+# Scores : table SQLite partagée (shared/scores.py), incrément atomique
+def save_score(user_id, points=1, guild_id=None, bot_key=None):
+    return add_points(user_id, points, guild_id=guild_id, bot_key=bot_key)
 
-def get_top_scores(limit=5):
-    scores = load_scores()
-    sorted_scores = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:limit]
-    return sorted_scores
+def get_top_scores(limit=5, guild_id=None, bot_key=None, window="all"):
+    if bot_key is not None:
+        return top_scores(limit, guild_id=guild_id, bot_key=bot_key)
+    # Fenêtre jour/semaine/tout, par serveur ou global : lu dans les agrégats
+    return leaderboard_page(window, guild_id, limit)[0]
 
 # --- MOTEUR DU JEU ---
 quiz_sessions = {} 
@@ -104,7 +93,7 @@ async def start_quiz(interaction, client: OpenAI, persona_name):
         print(f"Erreur Quiz : {e}")
         await interaction.followup.send("Oups, mon cerveau a grillé.")
 
-async def check_answer(message, client: OpenAI, persona_name):
+async def check_answer(message, client: OpenAI, persona_name, bot_key=None):
     try:
         cid = message.channel.id
         if cid not in quiz_sessions or not quiz_sessions[cid]["active"]:
@@ -146,7 +135,8 @@ async def check_answer(message, client: OpenAI, persona_name):
         # --- CAS 1 : GAGNÉ ---
         if "OUI" in verdict:
             quiz_sessions[cid]["active"] = False
-            new_score = save_score(message.author.id, 10)
+            guild_id = message.guild.id if message.guild else None
+            new_score = await asyncio.to_thread(save_score, message.author.id, 10, guild_id, bot_key)
             
             congrats_prompt = f"Tu es {persona_name}. Félicite {message.author.display_name} pour la bonne réponse '{correct_answer}'."
             res = client.chat.completions.create(model="gpt-3.5-turbo", messages=[{"role": "user", "content": congrats_prompt}])
@@ -156,7 +146,7 @@ async def check_answer(message, client: OpenAI, persona_name):
             embed.add_field(name="Score Total", value=f"🏆 **{new_score} pts**")
             embed.add_field(name="Classement", value="[Voir le Leaderboard](https://panel.4ubot.fr/leaderboard)", inline=False)
             
-            await message.channel.send(embed=embed)
+            send_queue.send(message.channel, embed=embed)
             return True 
             
         # --- CAS 2 : RATÉ (Avec Clash sécurisé) ---
@@ -175,7 +165,7 @@ async def check_answer(message, client: OpenAI, persona_name):
                         max_tokens=80
                     )
                     roast = res.choices[0].message.content.strip()
-                    await message.reply(f"❌ {roast}")
+                    send_queue.reply(message, f"❌ {roast}")
                 except:
                     pass
             
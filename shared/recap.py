@@ -1,51 +1,263 @@
+import asyncio
+import datetime
 import discord
+from collections import OrderedDict, deque
 from openai import OpenAI
 
-async def generate_recap(interaction: discord.Interaction, client: OpenAI, persona_name: str, limit: int = 30):
-    channel = interaction.channel
-    
-    # 1. Récupération de l'historique
-    messages_content = []
-    try:
-        async for msg in channel.history(limit=limit):
-            if not msg.author.bot and msg.content:
-                # On nettoie un peu (pseudo + contenu)
-                messages_content.append(f"{msg.author.display_name}: {msg.content}")
-    except Exception as e:
-        await interaction.followup.send(f"❌ Impossible de lire l'historique : {e}")
-        return
+# --- BUFFER DES MESSAGES RÉCENTS ---
+# Alimenté par on_message : /recap lit la mémoire au lieu de channel.history()
+RECAP_LIMIT = 30
+MAX_BUFFERED_CHANNELS = 500
 
-    if not messages_content:
-        await interaction.followup.send("❌ Pas assez de messages récents pour un flash info.")
+# channel_id -> {"messages": deque[(msg_id, ligne)], "warm": bool}
+# OrderedDict = ordre LRU, le salon le moins actif est évincé en premier
+channel_buffers = OrderedDict()
+
+# (channel_id, periode) -> {"last_id": id du dernier message résumé, "text": str}
+recap_cache = {}
+
+# --- MODE MAP-REDUCE (grandes fenêtres) ---
+# periode -> nombre d'heures (None = depuis minuit)
+RECAP_WINDOWS = {"1h": 1, "6h": 6, "jour": None}
+MAX_WINDOW_MESSAGES = 5000
+CHUNK_TOKEN_BUDGET = 2500
+CHUNK_CONCURRENCY = 4
+MAX_CACHED_CHUNKS = 2000
+# Les morceaux sont découpés dans des tranches horaires fixes : leurs bornes ne
+# dépendent pas du début exact de la fenêtre (qui glisse en continu pour 1h/6h)
+CHUNK_BUCKET_MINUTES = 15
+
+# (channel_id, premier_id, dernier_id) -> résumé partiel
+chunk_summaries = OrderedDict()
+
+
+def _get_buffer(channel_id, create=True):
+    buf = channel_buffers.get(channel_id)
+    if buf is not None:
+        channel_buffers.move_to_end(channel_id)
+        return buf
+    if not create:
+        return None
+
+    buf = {"messages": deque(maxlen=RECAP_LIMIT), "warm": False}
+    channel_buffers[channel_id] = buf
+    while len(channel_buffers) > MAX_BUFFERED_CHANNELS:
+        old_id, _ = channel_buffers.popitem(last=False)
+        recap_cache.pop((old_id, "recent"), None)
+    return buf
+
+
+def _format_line(msg):
+    return f"{msg.author.display_name}: {msg.content}"
+
+
+def record_message(message):
+    """Ajoute un message humain au buffer du salon (appelé depuis on_message)."""
+    if message.author.bot or not message.content or message.guild is None:
         return
+    buf = _get_buffer(message.channel.id)
+    buf["messages"].append((message.id, _format_line(message)))
+
+
+async def _backfill(channel, buf, limit):
+    """Buffer froid (démarrage, salon évincé) : on complète une fois via l'API."""
+    known = {mid for mid, _ in buf["messages"]}
+    fetched = []
+    async for msg in channel.history(limit=limit):
+        if not msg.author.bot and msg.content and msg.id not in known:
+            fetched.append((msg.id, _format_line(msg)))
+
+    # history() renvoie du plus récent au plus ancien
+    merged = sorted(list(buf["messages"]) + fetched, key=lambda x: x[0])
+    buf["messages"].clear()
+    buf["messages"].extend(merged[-RECAP_LIMIT:])
+    buf["warm"] = True
+
+
+def _estimate_tokens(text):
+    # Approximation suffisante pour le découpage (~4 caractères par token)
+    return len(text) // 4 + 1
+
+
+def _split_chunks(lines, budget=CHUNK_TOKEN_BUDGET):
+    """Découpe glouton depuis le début de la tranche : les premiers morceaux
+    restent identiques quand de nouveaux messages arrivent, donc réutilisables."""
+    chunks, current, used = [], [], 0
+    for mid, line in lines:
+        cost = _estimate_tokens(line)
+        if current and used + cost > budget:
+            chunks.append(current)
+            current, used = [], 0
+        current.append((mid, line))
+        used += cost
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _bucket_chunks(lines):
+    """Regroupe les messages par tranche de CHUNK_BUCKET_MINUTES puis découpe chaque
+    tranche : un même message retombe toujours dans le même morceau (cache réutilisable)."""
+    # Horodatage en ms dans les 42 bits hauts du snowflake ; l'époque Discord
+    # (2015-01-01 00:00 UTC) étant alignée sur l'heure, les tranches le sont aussi
+    bucket_ms = CHUNK_BUCKET_MINUTES * 60 * 1000
+    chunks, group, current_bucket = [], [], None
+    for mid, line in lines:
+        bucket = (mid >> 22) // bucket_ms
+        if group and bucket != current_bucket:
+            chunks.extend(_split_chunks(group))
+            group = []
+        current_bucket = bucket
+        group.append((mid, line))
+    if group:
+        chunks.extend(_split_chunks(group))
+    return chunks
+
+
+def _window_start(periode):
+    # Même fuseau que le scheduler (UTC+1)
+    offset = datetime.timedelta(hours=1)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    hours = RECAP_WINDOWS[periode]
+    if hours is None:
+        local = now + offset
+        return local.replace(hour=0, minute=0, second=0, microsecond=0) - offset
+    # Début exact : seules les clés du cache de morceaux sont alignées sur des tranches fixes
+    return now - datetime.timedelta(hours=hours)
+
+
+async def _fetch_window(channel, periode):
+    lines = []
+    # Du plus récent au plus ancien : si la fenêtre dépasse la limite, ce sont
+    # les messages les plus anciens qui sautent, pas les derniers
+    async for msg in channel.history(limit=MAX_WINDOW_MESSAGES, after=_window_start(periode), oldest_first=False):
+        if not msg.author.bot and msg.content:
+            lines.append((msg.id, _format_line(msg)))
+    lines.reverse()
+    return lines
 
-    # On inverse pour avoir l'ordre chronologique
-    conversation_text = "\n".join(reversed(messages_content))
 
-    # 2. Génération du Flash Info
+async def _complete(client: OpenAI, prompt, max_tokens, temperature=0.5):
+    # Appel bloquant déporté dans un thread pour ne pas geler la boucle
+    response = await asyncio.to_thread(
+        client.chat.completions.create,
+        model="gpt-3.5-turbo",
+        messages=[{"role": "user", "content": prompt}],
+        temperature=temperature,
+        max_tokens=max_tokens
+    )
+    return response.choices[0].message.content.strip()
+
+
+async def _summarize_chunk(client: OpenAI, channel_id, chunk, sem):
+    key = (channel_id, chunk[0][0], chunk[-1][0])
+    if key in chunk_summaries:
+        chunk_summaries.move_to_end(key)
+        return chunk_summaries[key]
+
+    text = "\n".join(line for _, line in chunk)
     prompt = (
+        "Voici un extrait de discussion d'un canal Discord :\n\n"
+        f"{text}\n\n"
+        "Résume les faits marquants en 3 à 5 puces factuelles (qui, quoi). Pas d'humour, pas d'intro."
+    )
+    async with sem:
+        summary = await _complete(client, prompt, 200)
+
+    chunk_summaries[key] = summary
+    while len(chunk_summaries) > MAX_CACHED_CHUNKS:
+        chunk_summaries.popitem(last=False)
+    return summary
+
+
+async def _reduce_partials(client: OpenAI, partials, sem):
+    """Si les résumés partiels dépassent le budget, on les condense par paquets."""
+    while _estimate_tokens("\n".join(partials)) > CHUNK_TOKEN_BUDGET and len(partials) > 1:
+        groups = _split_chunks(list(enumerate(partials)))
+
+        async def condense(group):
+            text = "\n\n".join(p for _, p in group)
+            async with sem:
+                return await _complete(client, f"Fusionne ces résumés en 5 puces maximum :\n\n{text}", 250)
+
+        partials = list(await asyncio.gather(*(condense(g) for g in groups)))
+    return partials
+
+
+def _flash_info_prompt(persona_name, intro, body):
+    return (
         f"Tu es {persona_name}, présentateur vedette du Journal TV. "
-        "Voici les dernières discussions sur ce canal Discord :\n\n"
-        f"{conversation_text}\n\n"
+        f"{intro}\n\n"
+        f"{body}\n\n"
         "Tâche : Fais un 'Flash Info' court, drôle et sarcastique résumant ce qu'il s'est passé. "
         "Moque-toi gentiment des participants. Utilise un ton journalistique exagéré. "
         "Commence par '🔴 FLASH INFO !' et finis par une punchline."
     )
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.8,
-            max_tokens=400
-        )
-        recap_text = response.choices[0].message.content.strip()
-        
-        # 3. Envoi
-        embed = discord.Embed(title="📺 LE JOURNAL DU SERVEUR", description=recap_text, color=0xFF0000)
-        embed.set_footer(text=f"Présenté par {persona_name}")
-        await interaction.followup.send(embed=embed)
 
+async def _recap_window(client: OpenAI, channel_id, persona_name, lines, periode):
+    sem = asyncio.Semaphore(CHUNK_CONCURRENCY)
+    chunks = _bucket_chunks(lines)
+
+    # Map : un résumé factuel par morceau (seuls les nouveaux partent à l'IA)
+    partials = await asyncio.gather(*(_summarize_chunk(client, channel_id, c, sem) for c in chunks))
+    partials = await _reduce_partials(client, list(partials), sem)
+
+    # Reduce : mise en forme Flash Info avec le persona
+    label = "aujourd'hui" if periode == "jour" else f"depuis {periode}"
+    prompt = _flash_info_prompt(
+        persona_name,
+        f"Voici le résumé de tout ce qui s'est dit {label} sur ce canal Discord ({len(lines)} messages) :",
+        "\n\n".join(partials)
+    )
+    return await _complete(client, prompt, 400, temperature=0.8)
+
+
+async def generate_recap(interaction: discord.Interaction, client: OpenAI, persona_name: str, limit: int = RECAP_LIMIT, periode: str = "recent"):
+    channel = interaction.channel
+    limit = min(limit, RECAP_LIMIT)
+
+    # 1. Récupération de l'historique
+    try:
+        if periode in RECAP_WINDOWS:
+            recent = await _fetch_window(channel, periode)
+        else:
+            # Mémoire d'abord, API seulement si le buffer est froid
+            periode = "recent"
+            buf = _get_buffer(channel.id)
+            if not buf["warm"]:
+                await _backfill(channel, buf, limit)
+            recent = list(buf["messages"])[-limit:]
     except Exception as e:
-        print(f"Erreur Recap: {e}")
-        await interaction.followup.send("Le prompteur est cassé (Erreur IA).")
\ No newline at end of file
+        await interaction.followup.send(f"❌ Impossible de lire l'historique : {e}")
+        return
+
+    if not recent:
+        await interaction.followup.send("❌ Pas assez de messages récents pour un flash info.")
+        return
+
+    cache_key = (channel.id, periode)
+    last_id = recent[-1][0]
+    cached = recap_cache.get(cache_key)
+    if cached and cached["last_id"] == last_id:
+        # Rien de nouveau depuis le dernier flash : on rediffuse
+        recap_text = cached["text"]
+    else:
+        # 2. Génération du Flash Info
+        try:
+            if periode == "recent":
+                conversation_text = "\n".join(line for _, line in recent)
+                prompt = _flash_info_prompt(persona_name, "Voici les dernières discussions sur ce canal Discord :", conversation_text)
+                recap_text = await _complete(client, prompt, 400, temperature=0.8)
+            else:
+                recap_text = await _recap_window(client, channel.id, persona_name, recent, periode)
+            recap_cache[cache_key] = {"last_id": last_id, "text": recap_text}
+        except Exception as e:
+            print(f"Erreur Recap: {e}")
+            await interaction.followup.send("Le prompteur est cassé (Erreur IA).")
+            return
+
+    # 3. Envoi
+    embed = discord.Embed(title="📺 LE JOURNAL DU SERVEUR", description=recap_text, color=0xFF0000)
+    embed.set_footer(text=f"Présenté par {persona_name}")
+    await interaction.followup.send(embed=embed)
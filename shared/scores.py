@@ -0,0 +1,248 @@
+import os
+import json
+import time
+import sqlite3
+import datetime
+import threading
+
+# Scores du quiz : SQLite partagé via le volume ./shared (bots + panel).
+# Remplace leaderboard.json (réécrit en entier à chaque point, sans verrou entre conteneurs).
+SCORES_DB = os.getenv("SCORES_DB", "shared/scores.db")
+LEGACY_SCORE_FILE = "shared/leaderboard.json"
+
+# Classements par fenêtre : agrégats incrémentaux (jour / semaine / tout) par serveur
+WINDOWS = ("all", "week", "day")
+ALL_GUILDS = "*"
+TZ_OFFSET = datetime.timedelta(hours=1)  # même fuseau que le scheduler
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS quiz_scores (
+    user_id TEXT NOT NULL,
+    guild_id TEXT NOT NULL DEFAULT '',
+    bot_key TEXT NOT NULL DEFAULT '',
+    score INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (user_id, guild_id, bot_key)
+);
+CREATE INDEX IF NOT EXISTS ix_quiz_scores_dim_score ON quiz_scores (guild_id, bot_key, score DESC);
+
+CREATE TABLE IF NOT EXISTS quiz_totals (
+    user_id TEXT PRIMARY KEY,
+    score INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_quiz_totals_score ON quiz_totals (score DESC);
+
+-- Journal brut des points (jamais relu pour les classements)
+CREATE TABLE IF NOT EXISTS quiz_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    guild_id TEXT NOT NULL,
+    bot_key TEXT NOT NULL,
+    points INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+
+-- period = 'all' | 'week' | 'day' ; bucket = '' | '2026-W42' | '2026-10-19' ; guild_id '*' = tous serveurs
+CREATE TABLE IF NOT EXISTS quiz_rollups (
+    period TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    guild_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    score INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (period, bucket, guild_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS ix_quiz_rollups_rank ON quiz_rollups (period, bucket, guild_id, score DESC, user_id);
+
+CREATE TABLE IF NOT EXISTS scores_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_conn = None
+# Connexion partagée entre la boucle et asyncio.to_thread : un seul écrivain à la fois
+_lock = threading.RLock()
+
+
+def get_conn():
+    global _conn
+    with _lock:
+        if _conn is None:
+            # isolation_level=None : on gère les transactions à la main (BEGIN IMMEDIATE)
+            _conn = sqlite3.connect(SCORES_DB, timeout=30, isolation_level=None, check_same_thread=False)
+            _conn.execute("PRAGMA journal_mode=WAL")
+            _conn.execute("PRAGMA busy_timeout=30000")
+            _conn.executescript(SCHEMA)
+            _migrate_legacy(_conn)
+            _backfill_rollups(_conn)
+        return _conn
+
+
+def current_bucket(window, ts=None):
+    local = datetime.datetime.fromtimestamp(ts or time.time(), datetime.timezone.utc) + TZ_OFFSET
+    if window == "day":
+        return local.date().isoformat()
+    if window == "week":
+        year, week, _ = local.isocalendar()
+        return f"{year}-W{week:02d}"
+    return ""
+
+
+def _backfill_rollups(conn):
+    """Agrégats 'all' pour les scores d'avant le journal (jour/semaine : pas d'horodatage)."""
+    if conn.execute("SELECT 1 FROM scores_meta WHERE key = 'rollups_backfilled'").fetchone():
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if not conn.execute("SELECT 1 FROM scores_meta WHERE key = 'rollups_backfilled'").fetchone():
+            conn.execute(
+                "INSERT OR IGNORE INTO quiz_rollups (period, bucket, guild_id, user_id, score) "
+                "SELECT 'all', '', ?, user_id, score FROM quiz_totals",
+                (ALL_GUILDS,)
+            )
+            conn.execute(
+                "INSERT OR IGNORE INTO quiz_rollups (period, bucket, guild_id, user_id, score) "
+                "SELECT 'all', '', guild_id, user_id, SUM(score) FROM quiz_scores WHERE guild_id != '' "
+                "GROUP BY guild_id, user_id"
+            )
+            conn.execute("INSERT INTO scores_meta (key, value) VALUES ('rollups_backfilled', '1')")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _migrate_legacy(conn):
+    """Import unique de leaderboard.json (scores sans serveur ni bot)."""
+    if conn.execute("SELECT 1 FROM scores_meta WHERE key = 'legacy_json_imported'").fetchone():
+        return
+    scores = {}
+    if os.path.exists(LEGACY_SCORE_FILE):
+        try:
+            with open(LEGACY_SCORE_FILE, "r") as f:
+                scores = json.load(f)
+        except Exception as e:
+            print(f"Erreur lecture {LEGACY_SCORE_FILE}: {e}")
+            return
+
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Un autre conteneur a pu migrer entre-temps
+        if not conn.execute("SELECT 1 FROM scores_meta WHERE key = 'legacy_json_imported'").fetchone():
+            rows = [(str(uid), int(pts), now) for uid, pts in scores.items()] if isinstance(scores, dict) else []
+            conn.executemany(
+                "INSERT INTO quiz_scores (user_id, guild_id, bot_key, score, updated_at) VALUES (?, '', '', ?, ?) "
+                "ON CONFLICT(user_id, guild_id, bot_key) DO UPDATE SET score = score + excluded.score",
+                rows
+            )
+            conn.executemany(
+                "INSERT INTO quiz_totals (user_id, score, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET score = score + excluded.score",
+                rows
+            )
+            conn.execute("INSERT INTO scores_meta (key, value) VALUES ('legacy_json_imported', ?)", (str(len(rows)),))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def add_points(user_id, points=1, guild_id=None, bot_key=None):
+    """Incrément atomique ; renvoie le nouveau total (tous serveurs/bots) du joueur."""
+    uid, gid, key = str(user_id), str(guild_id or ""), bot_key or ""
+    now = time.time()
+    with _lock:
+        return _add_points(get_conn(), uid, gid, key, points, now)
+
+
+def _add_points(conn, uid, gid, key, points, now):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(
+            "INSERT INTO quiz_scores (user_id, guild_id, bot_key, score, updated_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(user_id, guild_id, bot_key) DO UPDATE SET score = score + excluded.score, updated_at = excluded.updated_at",
+            (uid, gid, key, points, now)
+        )
+        conn.execute(
+            "INSERT INTO quiz_totals (user_id, score, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET score = score + excluded.score, updated_at = excluded.updated_at",
+            (uid, points, now)
+        )
+        conn.execute(
+            "INSERT INTO quiz_events (user_id, guild_id, bot_key, points, created_at) VALUES (?, ?, ?, ?, ?)",
+            (uid, gid, key, points, now)
+        )
+        guilds = (ALL_GUILDS, gid) if gid else (ALL_GUILDS,)
+        conn.executemany(
+            "INSERT INTO quiz_rollups (period, bucket, guild_id, user_id, score) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(period, bucket, guild_id, user_id) DO UPDATE SET score = score + excluded.score",
+            [(w, current_bucket(w, now), g, uid, points) for w in WINDOWS for g in guilds]
+        )
+        total = conn.execute("SELECT score FROM quiz_totals WHERE user_id = ?", (uid,)).fetchone()[0]
+        conn.execute("COMMIT")
+        return total
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def top_scores(limit=5, guild_id=None, bot_key=None):
+    """Top-k [(user_id, score)] global, par serveur et/ou par bot."""
+    with _lock:
+        return _top_scores(get_conn(), limit, guild_id, bot_key)
+
+
+def _top_scores(conn, limit, guild_id, bot_key):
+    if guild_id is None and bot_key is None:
+        return conn.execute(
+            "SELECT user_id, score FROM quiz_totals ORDER BY score DESC LIMIT ?", (limit,)
+        ).fetchall()
+    if guild_id is not None and bot_key is not None:
+        return conn.execute(
+            "SELECT user_id, score FROM quiz_scores WHERE guild_id = ? AND bot_key = ? ORDER BY score DESC LIMIT ?",
+            (str(guild_id), bot_key, limit)
+        ).fetchall()
+
+    column, value = ("guild_id", str(guild_id)) if guild_id is not None else ("bot_key", bot_key)
+    return conn.execute(
+        f"SELECT user_id, SUM(score) AS total FROM quiz_scores WHERE {column} = ? "
+        "GROUP BY user_id ORDER BY total DESC LIMIT ?",
+        (value, limit)
+    ).fetchall()
+
+
+def leaderboard_query(window="all", guild_id=None, limit=20, after=None):
+    """SQL et paramètres d'une page de classement (curseur "score:user_id").
+
+    Sans connexion : le panel l'exécute sur sa propre connexion en lecture seule.
+    Lève ValueError si le curseur est invalide."""
+    if window not in WINDOWS:
+        window = "all"
+    params = [window, current_bucket(window), str(guild_id) if guild_id else ALL_GUILDS]
+    sql = "SELECT user_id, score FROM quiz_rollups WHERE period = ? AND bucket = ? AND guild_id = ?"
+    if after:
+        score, _, uid = str(after).partition(":")
+        score = int(score)
+        sql += " AND (score < ? OR (score = ? AND user_id > ?))"
+        params += [score, score, uid]
+    sql += " ORDER BY score DESC, user_id LIMIT ?"
+    params.append(limit + 1)
+    return sql, params
+
+
+def leaderboard_result(rows, limit):
+    """Découpe les limit + 1 lignes lues : ([(user_id, score)], curseur_suivant | None)."""
+    next_cursor = f"{rows[limit - 1][1]}:{rows[limit - 1][0]}" if len(rows) > limit else None
+    return [(str(uid), int(score)) for uid, score in rows[:limit]], next_cursor
+
+
+def leaderboard_page(window="all", guild_id=None, limit=20, after=None):
+    """Classement paginé par curseur (score, user_id), servi par l'index des agrégats.
+
+    Renvoie ([(user_id, score)], curseur_suivant | None)."""
+    sql, params = leaderboard_query(window, guild_id, limit, after)
+    with _lock:
+        rows = get_conn().execute(sql, params).fetchall()
+    return leaderboard_result(rows, limit)
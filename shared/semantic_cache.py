@@ -0,0 +1,133 @@
+import re
+import time
+import zlib
+import random
+import unicodedata
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+# Cache de réponses "sémantique" local : pas de service d'embeddings externe.
+# Vecteurs = hashing trick (mots + trigrammes) pondérés TF-IDF, similarité cosinus NumPy.
+HASH_DIM = 2 ** 12
+CAPACITY = 512
+THRESHOLD = 0.82
+MAX_VARIANTS = 3          # réponses gardées par question pour varier
+FRESH_VARIANT_RATE = 0.3  # proba de régénérer tant qu'on n'a pas MAX_VARIANTS
+MAX_PROMPT_CHARS = 120    # au-delà, la question est trop spécifique pour être réutilisée
+
+
+def _normalize(text):
+    text = re.sub(r"<@!?\d+>", " ", text.lower())
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r"[^a-z0-9]+", " ", text).strip()
+
+
+def _features(text):
+    words = _normalize(text).split()
+    feats = list(words)
+    for w in words:
+        padded = f"#{w}#"
+        feats.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return feats
+
+
+class SemanticCache:
+    def __init__(self, capacity=CAPACITY, dim=HASH_DIM, threshold=THRESHOLD):
+        self.capacity = capacity
+        self.dim = dim
+        self.threshold = threshold
+        # Term frequencies brutes (sous-linéaires) ; l'IDF est appliqué à la requête
+        self.matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self.doc_freq = np.zeros(dim, dtype=np.float32)
+        self.last_used = np.zeros(capacity, dtype=np.float64)
+        self.entries = [None] * capacity  # {"prompt": str, "replies": [str]}
+        self.size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self.avg_latency = 0.0
+
+    def _vectorize(self, text):
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for f in _features(text):
+            vec[zlib.crc32(f.encode()) % self.dim] += 1.0
+        return np.log1p(vec)
+
+    def _best_match(self, vec):
+        if self.size == 0 or not vec.any():
+            return None, 0.0
+        idf = np.log((1.0 + self.size) / (1.0 + self.doc_freq)) + 1.0
+        rows = self.matrix[:self.size] * idf
+        q = vec * idf
+        norms = np.linalg.norm(rows, axis=1) * np.linalg.norm(q)
+        sims = (rows @ q) / np.where(norms == 0, 1.0, norms)
+        idx = int(np.argmax(sims))
+        return idx, float(sims[idx])
+
+    def lookup(self, prompt):
+        """Renvoie une réponse en cache si une question assez proche existe, sinon None."""
+        if len(prompt) > MAX_PROMPT_CHARS:
+            return None
+        idx, score = self._best_match(self._vectorize(prompt))
+        if idx is None or score < self.threshold:
+            self.misses += 1
+            return None
+
+        replies = self.entries[idx]["replies"]
+        # Variation : tant qu'on a peu de réponses, on laisse parfois l'IA en produire une autre
+        if len(replies) < MAX_VARIANTS and random.random() < FRESH_VARIANT_RATE:
+            self.misses += 1
+            return None
+
+        self.last_used[idx] = time.time()
+        self.hits += 1
+        self.saved_seconds += self.avg_latency
+        return random.choice(replies)
+
+    def store(self, prompt, reply, latency=None):
+        if latency is not None:
+            # Moyenne glissante du temps d'une vraie complétion = temps gagné par hit
+            self.avg_latency = latency if not self.avg_latency else 0.9 * self.avg_latency + 0.1 * latency
+        if len(prompt) > MAX_PROMPT_CHARS:
+            return
+
+        vec = self._vectorize(prompt)
+        if not vec.any():
+            return
+        idx, score = self._best_match(vec)
+        if idx is not None and score >= self.threshold:
+            replies = self.entries[idx]["replies"]
+            if reply not in replies:
+                replies.append(reply)
+                del replies[:-MAX_VARIANTS]
+            self.last_used[idx] = time.time()
+            return
+
+        if self.size < self.capacity:
+            idx = self.size
+            self.size += 1
+        else:
+            # Éviction LRU
+            idx = int(np.argmin(self.last_used))
+            self.doc_freq -= (self.matrix[idx] > 0)
+        self.matrix[idx] = vec
+        self.doc_freq += (vec > 0)
+        self.last_used[idx] = time.time()
+        self.entries[idx] = {"prompt": prompt, "replies": [reply]}
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+            "saved_seconds": round(self.saved_seconds, 1),
+        }
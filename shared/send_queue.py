@@ -0,0 +1,153 @@
+import time
+import asyncio
+import logging
+import discord
+from collections import deque
+
+# File d'envoi par salon/route : lisse les rafales (débat + scheduler + quiz dans
+# le même salon) au lieu de laisser discord.py dormir sur des 429 dans le handler.
+BUCKET_SIZE = 5        # Discord : ~5 messages / 5 s par salon
+BUCKET_WINDOW = 5.0
+MAX_MESSAGE_LEN = 2000
+MAX_SEND_ATTEMPTS = 3  # 429 successifs sur un même lot avant abandon
+
+
+class _RateLimitCounter(logging.Handler):
+    """discord.py ne remonte pas les 429 qu'il absorbe : on les compte via son logger."""
+
+    def __init__(self, queue):
+        super().__init__(level=logging.WARNING)
+        self.queue = queue
+
+    def emit(self, record):
+        if "429" in record.getMessage():
+            self.queue.rate_limited += 1
+
+
+class _Route:
+    def __init__(self):
+        self.jobs = deque()
+        self.tokens = float(BUCKET_SIZE)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.attempts = {}  # future -> tentatives déjà faites (lots remis en file après 429)
+        self.task = None
+
+
+class SendQueue:
+    def __init__(self):
+        self.routes = {}
+        self.sent = 0
+        self.coalesced = 0
+        self.rate_limited = 0
+        logging.getLogger("discord.http").addHandler(_RateLimitCounter(self))
+
+    # --- API ---
+    def send(self, channel, content=None, **kwargs):
+        """Met un message en file pour ce salon. Renvoie un Future (le Message envoyé, ou None).
+
+        Envoi « fire-and-forget » : les appelants n'attendent le Future que si l'ordre
+        compte par rapport à la suite (ex. réplique suivante du débat). Il est résolu
+        à None si l'envoi échoue ou est abandonné après MAX_SEND_ATTEMPTS 429.
+        """
+        return self._enqueue(("channel", channel.id), "send", channel, content, kwargs)
+
+    def reply(self, message, content=None, **kwargs):
+        return self._enqueue(("channel", message.channel.id), "reply", message, content, kwargs)
+
+    def followup(self, interaction, content=None, **kwargs):
+        # Les followups passent par le webhook de l'interaction : bucket séparé
+        return self._enqueue(("webhook", interaction.id), "followup", interaction, content, kwargs)
+
+    def stats(self):
+        return {
+            "depth": {f"{kind}:{key}": len(r.jobs) for (kind, key), r in self.routes.items() if r.jobs},
+            "queued": sum(len(r.jobs) for r in self.routes.values()),
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "rate_limited": self.rate_limited,
+        }
+
+    # --- INTERNE ---
+    def _enqueue(self, key, kind, target, content, kwargs):
+        future = asyncio.get_running_loop().create_future()
+        route = self.routes.setdefault(key, _Route())
+        route.jobs.append((kind, target, content, kwargs, future))
+        if route.task is None or route.task.done():
+            route.task = asyncio.create_task(self._worker(key, route))
+        return future
+
+    async def _acquire(self, route):
+        while True:
+            now = time.monotonic()
+            if now < route.paused_until:
+                await asyncio.sleep(route.paused_until - now)
+                continue
+            route.tokens = min(BUCKET_SIZE, route.tokens + (now - route.updated) * BUCKET_SIZE / BUCKET_WINDOW)
+            route.updated = now
+            if route.tokens >= 1:
+                route.tokens -= 1
+                return
+            await asyncio.sleep((1 - route.tokens) * BUCKET_WINDOW / BUCKET_SIZE)
+
+    def _pop_batch(self, route):
+        """Fusionne les lignes texte consécutives (sans embed ni option) en un seul message."""
+        batch = [route.jobs.popleft()]
+        kind, _, content, kwargs, _ = batch[0]
+        if kind != "send" or kwargs or not content:
+            return batch
+        size = len(content)
+        while route.jobs:
+            n_kind, _, n_content, n_kwargs, _ = route.jobs[0]
+            if n_kind != "send" or n_kwargs or not n_content or size + 1 + len(n_content) > MAX_MESSAGE_LEN:
+                break
+            size += 1 + len(n_content)
+            batch.append(route.jobs.popleft())
+        return batch
+
+    async def _deliver(self, kind, target, content, kwargs):
+        if kind == "reply":
+            return await target.reply(content=content, **kwargs)
+        if kind == "followup":
+            return await target.followup.send(content=content, **kwargs)
+        return await target.send(content=content, **kwargs)
+
+    async def _worker(self, key, route):
+        while route.jobs:
+            await self._acquire(route)
+            batch = self._pop_batch(route)
+            kind, target, _, kwargs, _ = batch[0]
+            content = "\n".join(job[2] for job in batch) if len(batch) > 1 else batch[0][2]
+            result = None
+            try:
+                result = await self._deliver(kind, target, content, kwargs)
+                self.sent += 1
+                self.coalesced += len(batch) - 1
+            except discord.HTTPException as e:
+                if e.status == 429:
+                    # discord.py a épuisé ses retries : on met la route en pause et on réessaie
+                    self.rate_limited += 1
+                    retry_after = float(e.response.headers.get("Retry-After", 1) or 1)
+                    route.paused_until = time.monotonic() + retry_after
+                    attempts = 1 + max(route.attempts.get(job[4], 0) for job in batch)
+                    if attempts < MAX_SEND_ATTEMPTS:
+                        for job in batch:
+                            route.attempts[job[4]] = attempts
+                        route.jobs.extendleft(reversed(batch))
+                        continue
+                    print(f"⚠️ Envoi {key} abandonné après {attempts} tentatives (429)")
+                else:
+                    print(f"Erreur envoi {key}: {e}")
+            except Exception as e:
+                print(f"Erreur envoi {key}: {e}")
+
+            for job in batch:
+                route.attempts.pop(job[4], None)
+                if not job[4].done():
+                    job[4].set_result(result)
+
+        if self.routes.get(key) is route:
+            del self.routes[key]
+
+
+send_queue = SendQueue()
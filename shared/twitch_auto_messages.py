@@ -1,10 +1,15 @@
 import os
 import json
+import time
 import random
 import asyncio
-from datetime import datetime, timedelta
 from openai import OpenAI
 
+STATE_DIR = "shared"
+AUTO_MESSAGE_CONCURRENCY = 5  # complétions simultanées
+PREGENERATE_LEAD = 120        # secondes avant l'échéance où l'on prépare le message
+PREGENERATED_MAX_AGE = 300    # au-delà, le message préparé est périmé (viewers ont bougé)
+
 class TwitchAutoMessages:
     def __init__(self, bot_key, panel_url, panel_token):
         self.bot_key = bot_key
@@ -13,27 +18,38 @@ class TwitchAutoMessages:
         self.openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
         self.auto_messages_enabled = False
         self.message_interval = 30  # minutes
-        self.last_auto_message = {}
+        # channel -> timestamp du dernier message (persisté : pas de rafale au redémarrage)
+        self.state_path = os.path.join(STATE_DIR, f"auto_messages_{bot_key}.json")
+        self.last_auto_message = self._load_state()
+        self.pregenerated = {}  # channel -> (message, généré_à)
+        self.semaphore = asyncio.Semaphore(AUTO_MESSAGE_CONCURRENCY)
         self.default_messages = [
             "Le chat est calme... trop calme.",
             "Deadpool est là, mais vous êtes où ?"
         ]
 
-    async def load_config_from_panel(self):
-        """Charge la configuration depuis le panel"""
+    def _load_state(self):
+        if not os.path.exists(self.state_path): return {}
         try:
-            import aiohttp
-            async with aiohttp.ClientSession() as session:
-                url = f"{self.panel_url}/api/bot/auto-messages/{self.bot_key}"
-                async with session.get(url, params={"token": self.panel_token}) as resp:
-                    if resp.status == 200:
-                        config = await resp.json()
-                        self.auto_messages_enabled = config.get("enabled", False)
-                        self.message_interval = config.get("interval", 30)
-                        return config
+            with open(self.state_path, "r") as f:
+                return {k: float(v) for k, v in json.load(f).items()}
         except Exception as e:
-            print(f"⚠️ Erreur chargement config auto-messages: {e}")
-            return None
+            print(f"⚠️ Erreur lecture état auto-messages: {e}")
+            return {}
+
+    def _save_state(self):
+        try:
+            tmp = f"{self.state_path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(self.last_auto_message, f)
+            os.replace(tmp, self.state_path)
+        except Exception as e:
+            print(f"⚠️ Erreur sauvegarde état auto-messages: {e}")
+
+    def apply_config(self, config):
+        """Applique la configuration reçue du panel (via TwitchBot.sync_with_panel)"""
+        self.auto_messages_enabled = config.get("enabled", False)
+        self.message_interval = config.get("interval", 30)
 
     async def generate_ai_message(self, channel_name, viewer_count, stream_title):
         """Génère une annonce de viewers avec le style Deadpool"""
@@ -51,7 +67,8 @@ Contraintes :
 3. Si le chiffre est bas, moque-toi gentiment. S'il est haut, sois faussement impressionné.
 4. Fais court (une seule phrase).
 """
-            response = self.openai_client.chat.completions.create(
+            response = await asyncio.to_thread(
+                self.openai_client.chat.completions.create,
                 model="gpt-3.5-turbo",
                 messages=[{"role": "user", "content": prompt}],
                 max_tokens=100,
@@ -62,31 +79,50 @@ Contraintes :
             print(f"⚠️ Erreur IA: {e}")
             return f"Deadpool ici : On est {viewer_count or 0} à regarder ce massacre !"
 
+    def seconds_until_due(self, channel_id):
+        """Secondes avant le prochain message auto de cette chaîne (<= 0 : à envoyer)."""
+        now = time.time()
+        interval = self.message_interval * 60
+        last = self.last_auto_message.get(channel_id)
+        if last is None:
+            # Chaîne jamais vue : échéance étalée sur l'intervalle plutôt que tout de suite
+            last = now - random.uniform(0, interval)
+            self.last_auto_message[channel_id] = last
+            self._save_state()
+        return interval - (now - last)
+
     def should_send_message(self, channel_id):
         """Vérifie si on doit envoyer un message auto"""
         if not self.auto_messages_enabled:
             return False
-            
-        now = datetime.now()
-        last_time = self.last_auto_message.get(channel_id)
-        
-        if not last_time:
-            return True
-            
-        time_diff = now - last_time
-        return time_diff.total_seconds() >= (self.message_interval * 60)
+        return self.seconds_until_due(channel_id) <= 0
+
+    def should_pregenerate(self, channel_id):
+        if not self.auto_messages_enabled or channel_id in self.pregenerated:
+            return False
+        return 0 < self.seconds_until_due(channel_id) <= PREGENERATE_LEAD
+
+    async def pregenerate(self, channel_name, channel_id, viewer_count=None, stream_title=None):
+        """Prépare le prochain message pour qu'il parte à l'heure pile."""
+        async with self.semaphore:
+            message = await self.generate_ai_message(channel_name, viewer_count, stream_title)
+        self.pregenerated[channel_id] = (message, time.time())
 
     async def send_auto_message(self, channel_name, channel_id, viewer_count=None, stream_title=None):
-        """Envoie un message automatique"""
+        """Renvoie le message auto à envoyer (préparé si possible), False si pas encore l'heure"""
         if not self.should_send_message(channel_id):
             return False
             
         try:
-            message = await self.generate_ai_message(channel_name, viewer_count, stream_title)
+            message, generated_at = self.pregenerated.pop(channel_id, (None, 0))
+            if not message or time.time() - generated_at > PREGENERATED_MAX_AGE:
+                async with self.semaphore:
+                    message = await self.generate_ai_message(channel_name, viewer_count, stream_title)
             
-            self.last_auto_message[channel_id] = datetime.now()
+            self.last_auto_message[channel_id] = time.time()
+            self._save_state()
             return message
             
         except Exception as e:
             print(f"⚠️ Erreur envoi message auto: {e}")
-            return None
\ No newline at end of file
+            return None
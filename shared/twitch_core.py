@@ -1,10 +1,21 @@
 import os
+import time
 import aiohttp
 import asyncio
 import logging
 from twitchio.ext import commands
 from openai import OpenAI
 from .twitch_auto_messages import TwitchAutoMessages
+from .twitch_limits import JoinScheduler, MessageBudget
+from .twitch_helix import LiveStatusPoller
+
+# --- PIPELINE DE RÉPONSES CHAT ---
+CHANNEL_COOLDOWN = 10      # secondes entre deux réponses dans une même chaîne
+USER_COOLDOWN = 30         # secondes entre deux réponses à un même viewer
+DEDUP_WINDOW = 60          # un message identique dans cette fenêtre est ignoré
+MAX_REPLY_AGE = 20         # au-delà, la réponse n'a plus de sens dans le chat
+REPLY_WORKERS = 4          # complétions simultanées, toutes chaînes confondues
+REPLY_QUEUE_SIZE = 100
 
 class TwitchBot(commands.Bot):
     def __init__(self, bot_key, system_prompt):
@@ -22,8 +33,24 @@ class TwitchBot(commands.Bot):
         # Système de messages automatiques
         self.auto_messages = TwitchAutoMessages(bot_key, self.panel_url, self.panel_token)
         
-        # Liste des chaînes rejointes
+        # Liste des chaînes rejointes (JOIN/PART par lots, envois sous budget)
         self.joined_channels = set()
+        self.join_scheduler = JoinScheduler(self)
+        self.message_budget = MessageBudget(self)
+
+        # Statut live (viewers, titre) via Helix
+        self.live_status = LiveStatusPoller(self.client_id, self.client_secret)
+
+        # Session HTTP unique (keep-alive vers le panel) + tâches de fond
+        self.http_session = None
+        self.scheduled_tasks = []
+        self._background_tasks = []
+
+        # Réponses chat : file bornée + cooldowns / dédoublonnage
+        self.reply_queue = asyncio.Queue(maxsize=REPLY_QUEUE_SIZE)
+        self._last_channel_reply = {}
+        self._last_user_reply = {}
+        self._recent_triggers = {}
 
         logging.basicConfig(level=logging.INFO)
         logging.getLogger("twitchio").setLevel(logging.INFO)
@@ -45,41 +72,101 @@ class TwitchBot(commands.Bot):
     async def event_ready(self):
         bot_name = getattr(self, "nick", None) or "Unknown"
         print(f"🟣 [{self.bot_key.upper()}] Connecté à Twitch en tant que {bot_name}", flush=True)
-        
-        # Charger la configuration initiale
-        await self.auto_messages.load_config_from_panel()
-        
-        # Lancer les boucles
-        asyncio.create_task(self.sync_channels_loop())
-        asyncio.create_task(self.auto_messages_loop())
-        asyncio.create_task(self.scheduled_tasks_loop())
 
-    async def sync_channels_loop(self):
+        # event_ready peut être rappelé après une reconnexion IRC
+        if self._background_tasks:
+            return
+
+        self.http_session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=15, connect=5),
+            connector=aiohttp.TCPConnector(limit=10, keepalive_timeout=60)
+        )
+
+        # Charger la configuration initiale puis lancer les boucles
+        try:
+            await self.sync_with_panel()
+        except Exception as e:
+            print(f"⚠️ Erreur Sync Twitch : {e}", flush=True)
+        self._background_tasks = [
+            asyncio.create_task(self.join_scheduler.run()),
+            asyncio.create_task(self.panel_sync_loop()),
+            asyncio.create_task(self.live_status.run(self)),
+            asyncio.create_task(self.auto_messages_loop()),
+        ]
+        self._background_tasks += [asyncio.create_task(self.reply_worker()) for _ in range(REPLY_WORKERS)]
+
+    async def close(self):
+        for task in self._background_tasks:
+            task.cancel()
+        self._background_tasks = []
+        if self.http_session and not self.http_session.closed:
+            await self.http_session.close()
+        await super().close()
+
+    async def _panel_get(self, path):
+        url = f"{self.panel_url}{path}"
+        async with self.http_session.get(url, params={"token": self.panel_token}) as resp:
+            if resp.status == 200:
+                return await resp.json()
+            print(f"⚠️ [{self.bot_key}] Panel {path} -> HTTP {resp.status}", flush=True)
+            return None
+
+    async def sync_with_panel(self):
+        """Récupère en une passe : chaînes autorisées, tâches planifiées et config auto-messages."""
+        config, tasks, auto_config = await asyncio.gather(
+            self._panel_get(f"/api/bot/config/{self.bot_key}"),
+            self._panel_get(f"/api/bot/tasks/{self.bot_key}"),
+            self._panel_get(f"/api/bot/auto-messages/{self.bot_key}"),
+            return_exceptions=True
+        )
+
+        if isinstance(config, dict):
+            await self.apply_allowed_channels(config.get("allowed_twitch_channels", []))
+        elif isinstance(config, Exception):
+            print(f"⚠️ Erreur Sync Twitch : {config}", flush=True)
+
+        if isinstance(tasks, list):
+            self.scheduled_tasks = tasks
+        elif isinstance(tasks, Exception):
+            print(f"⚠️ Erreur tâches planifiées: {tasks}", flush=True)
+
+        if isinstance(auto_config, dict):
+            self.auto_messages.apply_config(auto_config)
+        elif isinstance(auto_config, Exception):
+            print(f"⚠️ Erreur chargement config auto-messages: {auto_config}", flush=True)
+
+    async def apply_allowed_channels(self, channels):
+        allowed = {str(x).strip().lower() for x in channels if str(x).strip()}
+
+        # Le scheduler se charge du rythme : ici on ne fait que le diff
+        pending_join = set(self.join_scheduler.to_join)
+        to_join = allowed - self.joined_channels - pending_join
+        to_part = (self.joined_channels | pending_join) - allowed
+
+        if to_join:
+            self.join_scheduler.join(sorted(to_join))
+        if to_part:
+            self.join_scheduler.part(sorted(to_part))
+
+    def limits_stats(self):
+        return {
+            "joined": len(self.joined_channels),
+            "join_queue": len(self.join_scheduler.to_join),
+            "join_wait": self.join_scheduler.wait_stats.as_dict(),
+            "send_wait": self.message_budget.wait_stats.as_dict(),
+        }
+
+    async def panel_sync_loop(self):
+        cycles = 0
         while True:
+            await asyncio.sleep(60)
             try:
-                url = f"{self.panel_url}/api/bot/config/{self.bot_key}"
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(url, params={"token": self.panel_token}) as resp:
-                        if resp.status == 200:
-                            data = await resp.json()
-                            allowed = {str(x).strip().lower() for x in data.get("allowed_twitch_channels", []) if str(x).strip()}
-
-                            to_join = list(allowed - self.joined_channels)
-                            to_part = list(self.joined_channels - allowed)
-                            
-                            if to_join:
-                                print(f"➕ [{self.bot_key}] Rejoint : {to_join}", flush=True)
-                                await self.join_channels(to_join)
-                                self.joined_channels.update(to_join)
-                                
-                            if to_part:
-                                print(f"➖ [{self.bot_key}] Quitte : {to_part}", flush=True)
-                                await self.part_channels(to_part)
-                                self.joined_channels.difference_update(to_part)
+                await self.sync_with_panel()
             except Exception as e:
                 print(f"⚠️ Erreur Sync Twitch : {e}", flush=True)
-            
-            await asyncio.sleep(60)
+            cycles += 1
+            if cycles % 10 == 0:
+                print(f"📊 [{self.bot_key}] Limites IRC : {self.limits_stats()}", flush=True)
 
     async def event_message(self, message):
         if message.echo: return
@@ -89,9 +176,51 @@ class TwitchBot(commands.Bot):
         content = message.content.lower()
         should_reply = any(w in content for w in trigger_words)
 
-        if should_reply:
-            response = self.ask_gpt(message.content, message.author.name)
-            await message.channel.send(f"@{message.author.name} {response}")
+        if should_reply and self.accept_trigger(message.channel.name, message.author.name, content):
+            try:
+                self.reply_queue.put_nowait((time.monotonic(), message))
+            except asyncio.QueueFull:
+                print(f"⚠️ [{self.bot_key}] File de réponses pleine, message ignoré", flush=True)
+
+    def accept_trigger(self, channel_name, user_name, content):
+        """Cooldowns chaîne/viewer + dédoublonnage : un raid qui spamme le nom = une seule réponse."""
+        now = time.monotonic()
+        user_key = (channel_name, user_name)
+        dedup_key = (channel_name, " ".join(content.split()))
+
+        if now - self._recent_triggers.get(dedup_key, -DEDUP_WINDOW) < DEDUP_WINDOW:
+            return False
+        self._recent_triggers[dedup_key] = now
+
+        if now - self._last_channel_reply.get(channel_name, -CHANNEL_COOLDOWN) < CHANNEL_COOLDOWN:
+            return False
+        if now - self._last_user_reply.get(user_key, -USER_COOLDOWN) < USER_COOLDOWN:
+            return False
+
+        self._last_channel_reply[channel_name] = now
+        self._last_user_reply[user_key] = now
+
+        if len(self._recent_triggers) > 5000:
+            self._recent_triggers = {k: t for k, t in self._recent_triggers.items() if now - t < DEDUP_WINDOW}
+            self._last_user_reply = {k: t for k, t in self._last_user_reply.items() if now - t < USER_COOLDOWN}
+        return True
+
+    async def reply_worker(self):
+        while True:
+            received_at, message = await self.reply_queue.get()
+            try:
+                if time.monotonic() - received_at > MAX_REPLY_AGE:
+                    continue
+                response = await asyncio.to_thread(self.ask_gpt, message.content, message.author.name)
+                # La complétion a pu être longue : on ne répond pas à un message déjà noyé dans le chat
+                if time.monotonic() - received_at > MAX_REPLY_AGE:
+                    print(f"⌛ [{self.bot_key}] Réponse trop tardive pour #{message.channel.name}, abandon", flush=True)
+                    continue
+                await self.message_budget.send(message.channel, f"@{message.author.name} {response}")
+            except Exception as e:
+                print(f"⚠️ Erreur réponse chat: {e}", flush=True)
+            finally:
+                self.reply_queue.task_done()
 
     def ask_gpt(self, user_msg, user_name):
         try:
@@ -111,52 +240,44 @@ class TwitchBot(commands.Bot):
             return "Oups, mon cerveau a lagué !"
 
     async def auto_messages_loop(self):
-        """Boucle de messages automatiques"""
+        """Boucle de messages automatiques : chaînes dues traitées en parallèle, cadence fixe"""
+        loop = asyncio.get_running_loop()
         while True:
+            started = loop.time()
             try:
-                # --- RECHARGEMENT CONFIG DYNAMIQUE ---
-                await self.auto_messages.load_config_from_panel()
-                
-                # Si désactivé, on attend juste 1 minute avant de revérifier la config
-                if not self.auto_messages.auto_messages_enabled:
-                    await asyncio.sleep(60)
-                    continue
-
-                for channel_id in self.joined_channels:
-                    try:
+                # Config rechargée par panel_sync_loop.
+                if self.auto_messages.auto_messages_enabled:
+                    jobs = []
+                    for channel_id in list(self.joined_channels):
+                        # Chaîne hors ligne (ou statut inconnu) : pas d'annonce, pas de tokens gaspillés
+                        live = self.live_status.get(channel_id)
                         channel = self.get_channel(channel_id)
-                        if channel:
-                            # Tenter d'envoyer le message viewer count
-                            message = await self.auto_messages.send_auto_message(
-                                channel.name, 
-                                channel_id,
-                                viewer_count=getattr(channel, 'viewer_count', None),
-                                stream_title=getattr(channel, 'title', None)
-                            )
-                            
-                            if message:
-                                await channel.send(message)
-                                print(f"🤖 [{self.bot_key.upper()}] Annonce viewers sur {channel.name}: {message}")
-                    except Exception as e:
-                        print(f"⚠️ Erreur message auto sur {channel_id}: {e}")
-                        
+                        if not (live and live["live"] and channel):
+                            continue
+
+                        if self.auto_messages.should_send_message(channel_id):
+                            jobs.append(self.send_auto_message(channel, live))
+                        elif self.auto_messages.should_pregenerate(channel_id):
+                            jobs.append(self.auto_messages.pregenerate(channel.name, channel_id, live["viewers"], live["title"]))
+
+                    # Le sémaphore de TwitchAutoMessages borne le nombre de complétions simultanées
+                    results = await asyncio.gather(*jobs, return_exceptions=True)
+                    for r in results:
+                        if isinstance(r, Exception):
+                            print(f"⚠️ Erreur message auto: {r}")
             except Exception as e:
                 print(f"⚠️ Erreur boucle messages auto: {e}")
-            
-            # Attente de sécurité (boucle principale)
-            await asyncio.sleep(60)
 
-    async def scheduled_tasks_loop(self):
-        """Boucle pour exécuter les tâches planifiées depuis le Panel (Table SQL)"""
-        # Cette boucle gère les tâches uniques, pas la récurrence automatique configurée ci-dessus
-        while True:
-            try:
-                url = f"{self.panel_url}/api/bot/tasks/{self.bot_key}"
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(url, params={"token": self.panel_token}) as resp:
-                        if resp.status == 200:
-                            tasks = await resp.json()
-                            # ... logique tâches SQL existante (non utilisée pour l'auto-message viewers) ...
-            except Exception as e:
-                print(f"⚠️ Erreur boucle tâches planifiées: {e}")
-            await asyncio.sleep(300)
\ No newline at end of file
+            # Cadence de 60 s sans dérive, quelle que soit la durée de la passe
+            await asyncio.sleep(max(0, 60 - (loop.time() - started)))
+
+    async def send_auto_message(self, channel, live):
+        message = await self.auto_messages.send_auto_message(
+            channel.name,
+            channel.name,
+            viewer_count=live["viewers"],
+            stream_title=live["title"]
+        )
+        if message:
+            await self.message_budget.send(channel, message)
+            print(f"🤖 [{self.bot_key.upper()}] Annonce viewers sur {channel.name}: {message}")
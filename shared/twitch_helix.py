@@ -0,0 +1,91 @@
+import time
+import asyncio
+
+HELIX_STREAMS_URL = "https://api.twitch.tv/helix/streams"
+TWITCH_TOKEN_URL = "https://id.twitch.tv/oauth2/token"
+POLL_INTERVAL = 60       # secondes
+LOGINS_PER_REQUEST = 100 # maximum accepté par /helix/streams
+
+
+class LiveStatusPoller:
+    """Statut live des chaînes rejointes via Helix (100 logins par requête).
+
+    L'objet Channel IRC ne connaît ni les viewers ni le titre : cette table
+    en mémoire est la seule source fiable pour les messages automatiques."""
+
+    def __init__(self, client_id, client_secret):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.enabled = bool(client_id and client_secret)
+        self._token = None
+        self._token_expires = 0.0
+        # login -> {"live": bool, "viewers": int, "title": str, "started_at": str | None, "updated": float}
+        self.status = {}
+
+    async def _app_token(self, session):
+        # Token app (client credentials) mis en cache, renouvelé 5 min avant expiration
+        if self._token and time.time() < self._token_expires - 300:
+            return self._token
+        params = {
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+            "grant_type": "client_credentials",
+        }
+        async with session.post(TWITCH_TOKEN_URL, params=params) as resp:
+            resp.raise_for_status()
+            data = await resp.json()
+        self._token = data["access_token"]
+        self._token_expires = time.time() + int(data.get("expires_in", 3600))
+        return self._token
+
+    async def _fetch_live(self, session, logins):
+        token = await self._app_token(session)
+        headers = {"Client-Id": self.client_id, "Authorization": f"Bearer {token}"}
+        params = [("user_login", login) for login in logins] + [("first", str(LOGINS_PER_REQUEST))]
+        async with session.get(HELIX_STREAMS_URL, params=params, headers=headers) as resp:
+            if resp.status == 401:
+                # Token révoqué : on le jette, il sera régénéré au prochain passage
+                self._token = None
+            resp.raise_for_status()
+            data = await resp.json()
+        return data.get("data", [])
+
+    async def poll(self, session, logins):
+        logins = sorted({l.lower() for l in logins})
+        now = time.time()
+        batches = [logins[i:i + LOGINS_PER_REQUEST] for i in range(0, len(logins), LOGINS_PER_REQUEST)]
+        results = await asyncio.gather(*(self._fetch_live(session, b) for b in batches), return_exceptions=True)
+
+        for batch, streams in zip(batches, results):
+            if isinstance(streams, Exception):
+                print(f"⚠️ Erreur Helix streams : {streams}", flush=True)
+                continue
+            live = {s["user_login"].lower(): s for s in streams if s.get("type") == "live"}
+            for login in batch:
+                s = live.get(login)
+                self.status[login] = {
+                    "live": s is not None,
+                    "viewers": s.get("viewer_count", 0) if s else 0,
+                    "title": s.get("title", "") if s else "",
+                    "started_at": s.get("started_at") if s else None,
+                    "updated": now,
+                }
+
+        # On oublie les chaînes quittées
+        for login in set(self.status) - set(logins):
+            del self.status[login]
+
+    def get(self, login):
+        return self.status.get(login.lower())
+
+    async def run(self, bot):
+        if not self.enabled:
+            print(f"⚠️ [{bot.bot_key}] TWITCH_CLIENT_ID/SECRET absents : statut live indisponible, messages auto coupés.", flush=True)
+            return
+        while True:
+            try:
+                if bot.joined_channels:
+                    await self.poll(bot.http_session, bot.joined_channels)
+            except Exception as e:
+                print(f"⚠️ Erreur poller live : {e}", flush=True)
+            await asyncio.sleep(POLL_INTERVAL)
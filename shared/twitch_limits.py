@@ -0,0 +1,143 @@
+import time
+import asyncio
+
+# Limites IRC Twitch (compte non vérifié)
+JOIN_LIMIT = 20            # JOIN par fenêtre
+JOIN_WINDOW = 10           # secondes
+MSG_LIMIT = 20             # messages / 30 s dans les chaînes où le bot n'est pas modo
+MSG_LIMIT_MOD = 100        # messages / 30 s dans les chaînes où il est modo/broadcaster
+MSG_WINDOW = 30
+CHANNEL_MSG_INTERVAL = 1   # hors modo : 1 message / seconde par chaîne
+
+
+class TokenBucket:
+    def __init__(self, capacity, period):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, n=1):
+        """Attend qu'il y ait n jetons. Renvoie le temps d'attente (s)."""
+        started = time.monotonic()
+        async with self.lock:
+            while True:
+                self._refill()
+                if self.tokens >= n:
+                    self.tokens -= n
+                    return time.monotonic() - started
+                await asyncio.sleep((n - self.tokens) / self.rate)
+
+
+class WaitStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, waited):
+        self.count += 1
+        self.total += waited
+        self.max = max(self.max, waited)
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "avg_wait": round(self.total / self.count, 2) if self.count else 0.0,
+            "max_wait": round(self.max, 2),
+        }
+
+
+class JoinScheduler:
+    """Rejoint/quitte les chaînes par lots sans dépasser la limite de JOIN."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.bucket = TokenBucket(JOIN_LIMIT, JOIN_WINDOW)
+        self.to_join = {}   # chaîne -> instant de mise en file
+        self.to_part = set()
+        self.wakeup = asyncio.Event()
+        self.wait_stats = WaitStats()
+
+    def join(self, channels):
+        now = time.monotonic()
+        for ch in channels:
+            self.to_part.discard(ch)
+            self.to_join.setdefault(ch, now)
+        self.wakeup.set()
+
+    def part(self, channels):
+        for ch in channels:
+            # Encore en file d'attente : il suffit d'annuler le JOIN
+            if self.to_join.pop(ch, None) is not None and ch not in self.bot.joined_channels:
+                continue
+            self.to_part.add(ch)
+        self.wakeup.set()
+
+    async def run(self):
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            try:
+                if self.to_part:
+                    # PART n'est pas limité : on vide d'un coup
+                    batch = list(self.to_part)
+                    self.to_part.clear()
+                    print(f"➖ [{self.bot.bot_key}] Quitte : {batch}", flush=True)
+                    await self.bot.part_channels(batch)
+                    self.bot.joined_channels.difference_update(batch)
+
+                while self.to_join:
+                    size = min(len(self.to_join), JOIN_LIMIT)
+                    await self.bucket.acquire(size)
+                    batch = list(self.to_join)[:size]
+                    now = time.monotonic()
+                    for ch in batch:
+                        self.wait_stats.add(now - self.to_join.pop(ch))
+                    print(f"➕ [{self.bot.bot_key}] Rejoint : {batch}", flush=True)
+                    await self.bot.join_channels(batch)
+                    self.bot.joined_channels.update(batch)
+            except Exception as e:
+                print(f"⚠️ Erreur join/part Twitch : {e}", flush=True)
+                await asyncio.sleep(JOIN_WINDOW)
+                self.wakeup.set()
+
+
+class MessageBudget:
+    """Budget d'envoi par compte (modo / non modo) et par chaîne."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.account = TokenBucket(MSG_LIMIT, MSG_WINDOW)
+        self.account_mod = TokenBucket(MSG_LIMIT_MOD, MSG_WINDOW)
+        self.channels = {}
+        self.wait_stats = WaitStats()
+
+    def is_mod(self, channel):
+        try:
+            me = channel.get_chatter(self.bot.nick)
+        except Exception:
+            me = None
+        return bool(me and (getattr(me, "is_mod", False) or getattr(me, "is_broadcaster", False)))
+
+    async def send(self, channel, text):
+        waited = 0.0
+        if self.is_mod(channel):
+            waited += await self.account_mod.acquire()
+        else:
+            bucket = self.channels.get(channel.name)
+            if bucket is None:
+                bucket = self.channels[channel.name] = TokenBucket(1, CHANNEL_MSG_INTERVAL)
+            waited += await bucket.acquire()
+            waited += await self.account.acquire()
+            # Le plafond global (100 / 30 s) s'applique aussi
+            waited += await self.account_mod.acquire()
+        self.wait_stats.add(waited)
+        await channel.send(text)
+        return waited